@@ -0,0 +1,179 @@
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from starlette.responses import JSONResponse
+from app.db import get_database
+from app.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# "memory" keeps buckets per worker process; "mongo" shares them across workers at the
+# cost of one round trip per check.
+ADMISSION_BACKEND = os.getenv("ADMISSION_BACKEND", "memory")
+# Token buckets: sustained requests per second and burst size. A rate of 0 disables the limit.
+IP_RATE = float(os.getenv("ADMISSION_IP_RATE", "100"))
+IP_BURST = float(os.getenv("ADMISSION_IP_BURST", "200"))
+PRINCIPAL_RATE = float(os.getenv("ADMISSION_PRINCIPAL_RATE", "50"))
+PRINCIPAL_BURST = float(os.getenv("ADMISSION_PRINCIPAL_BURST", "100"))
+# Concurrent requests per worker for expensive route classes (0 = unlimited).
+CONCURRENCY = {
+    "login": int(os.getenv("ADMISSION_LOGIN_CONCURRENCY", "8")),
+    "bulk": int(os.getenv("ADMISSION_BULK_CONCURRENCY", "4")),
+    "export": int(os.getenv("ADMISSION_EXPORT_CONCURRENCY", "2")),
+}
+BUSY_RETRY_AFTER = int(os.getenv("ADMISSION_BUSY_RETRY_AFTER", "1"))
+MEMORY_BUCKETS = int(os.getenv("ADMISSION_MEMORY_BUCKETS", "100000"))
+BUCKET_COLLECTION = "rate_limits"
+EXEMPT_PATHS = {"/health", "/metrics"}
+ROUTE_CLASSES = [
+    ("login", re.compile(r"^/auth/(login|register)$")),
+    ("export", re.compile(r"/export$")),
+    ("bulk", re.compile(r"/(bulk|ingest|backfill)$")),
+]
+
+shed_requests = Counter("admission_shed_total", "Requests rejected by admission control.", ("reason", "route_class"))
+
+
+class MemoryBuckets:
+    """Token buckets in this process, least recently used evicted first (an evicted bucket starts full)."""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = MEMORY_BUCKETS):
+        self.maxsize = maxsize
+        self.buckets = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Spend `cost` tokens; return 0 if admitted, else seconds until enough tokens accrue."""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.maxsize:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class MongoBuckets:
+    """Token buckets refilled and spent atomically in one pipeline update, shared by every worker."""
+
+    name = "mongo"
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        now = datetime.utcnow()
+        elapsed = {"$max": [0, {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        doc = await get_database()[BUCKET_COLLECTION].find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {"admitted": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$admitted", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return 0.0 if doc["admitted"] else (cost - doc["tokens"]) / rate
+
+
+def route_class(path: str):
+    for name, pattern in ROUTE_CLASSES:
+        if pattern.search(path):
+            return name
+    return None
+
+
+class AdmissionController:
+    def __init__(self, backend):
+        self.backend = backend
+        self.in_flight = {name: 0 for name in CONCURRENCY}
+        self.shed = 0
+
+    async def wait_for(self, key: str, rate: float, burst: float) -> float:
+        if rate <= 0:
+            return 0.0
+        try:
+            return await self.backend.take(key, rate, burst)
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down with it.
+            logger.warning(f"Admission backend {self.backend.name} failed: {e}")
+            return 0.0
+
+    def record_shed(self, reason: str, route_class: str):
+        self.shed += 1
+        shed_requests.inc((reason, route_class))
+
+    async def admit_principal(self, user_id: str):
+        """Called from get_current_user once the principal is known."""
+        if not ADMISSION_ENABLED:
+            return
+        wait = await self.wait_for(f"principal:{user_id}", PRINCIPAL_RATE, PRINCIPAL_BURST)
+        if wait:
+            self.record_shed("principal_rate", "any")
+            raise HTTPException(
+                status_code=429, detail="Rate limit exceeded", headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "enabled": ADMISSION_ENABLED,
+            "shed": self.shed,
+            **{f"in_flight_{name}": count for name, count in self.in_flight.items()},
+        }
+
+
+admission = AdmissionController(MongoBuckets() if ADMISSION_BACKEND == "mongo" else MemoryBuckets())
+
+
+class AdmissionMiddleware:
+    """Per-IP token buckets and per-class concurrency limits, applied before routing.
+
+    Rejections are cheap and immediate: 429 when a bucket is empty and 503 when a
+    route class is saturated, both with Retry-After.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def _reject(self, scope, receive, send, status_code: int, reason: str, route_class: str, retry_after: int):
+        self.controller.record_shed(reason, route_class)
+        detail = "Too many requests" if status_code == 429 else "Server busy, retry later"
+        response = JSONResponse({"detail": detail}, status_code=status_code, headers={"Retry-After": str(retry_after)})
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not ADMISSION_ENABLED or scope["method"] == "OPTIONS"
+                or scope["path"] in EXEMPT_PATHS):
+            return await self.app(scope, receive, send)
+        name = route_class(scope["path"])
+        label = name or "default"
+        client = scope.get("client")
+        wait = await self.controller.wait_for(f"ip:{client[0] if client else 'unknown'}", IP_RATE, IP_BURST)
+        if wait:
+            return await self._reject(scope, receive, send, 429, "ip_rate", label, math.ceil(wait))
+        limit = CONCURRENCY.get(name, 0)
+        if not limit:
+            return await self.app(scope, receive, send)
+        # Check and increment happen without an await in between, so no lock is needed.
+        if self.controller.in_flight[name] >= limit:
+            return await self._reject(scope, receive, send, 503, "concurrency", label, BUSY_RETRY_AFTER)
+        self.controller.in_flight[name] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.in_flight[name] -= 1
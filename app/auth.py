@@ -2,22 +2,64 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from app.db import get_database
+from app.cache import TTLCache
+from app.admission import admission
 import os
+from typing import Optional
+import logging
 from bson import ObjectId
 
 SECRET_KEY = os.getenv("SECRET_KEY", "secret")
 ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# Tokens for ?access_token= on event streams: short-lived and accepted nowhere else,
+# since query strings end up in proxy and access logs.
+STREAM_TOKEN_SCOPE = "stream"
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
+
+# Principals are cached for much less than a token's lifetime so that role or
+# is_active changes made outside PATCH /auth/users/{user_id} still converge quickly.
+PRINCIPAL_CACHE_TTL = min(int(os.getenv("PRINCIPAL_CACHE_TTL", "300")), ACCESS_TOKEN_EXPIRE_MINUTES * 60 - 1)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 def create_access_token(data: dict, expires_delta=None):
     from datetime import datetime, timedelta
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=60))
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_stream_token(user_id: str):
+    from datetime import timedelta
+    return create_access_token(
+        {"sub": user_id, "scope": STREAM_TOKEN_SCOPE}, timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
+def invalidate_principal(user_id: str):
+    principal_cache.invalidate(str(user_id))
+
+async def load_principal(user_id: str):
+    db = get_database()
+    try:
+        user = await db["users"].find_one({"_id": ObjectId(user_id)})
+    except Exception:
+        user = await db["users"].find_one({"_id": user_id})
+    if user is not None:
+        user["_id"] = str(user["_id"])
+    return user
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return await authenticate(token)
+
+async def authenticate(token: str, scope: Optional[str] = None):
+    """Resolve a JWT to its active principal; the token's scope must equal `scope`."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,25 +67,35 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print("JWT payload:", payload)  
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            print("No user_id in token payload") 
-            raise credentials_exception
-        db = get_database()
-        try:
-            user = await db["users"].find_one({"_id": ObjectId(user_id)})
-        except Exception:
-            user = await db["users"].find_one({"_id": user_id})
-        print("User from DB:", user) 
-        if user is None or not user.get("is_active", True):
-            print("User not found or inactive") 
-            raise credentials_exception
-        user["_id"] = str(user["_id"])
-        return user
     except JWTError as e:
-        print("JWTError:", e) 
+        logger.debug("JWTError: %s", e)
+        raise credentials_exception
+    if payload.get("scope") != scope:
+        logger.debug("Token scope %s not accepted here", payload.get("scope"))
         raise credentials_exception
+    user_id: str = payload.get("sub")
+    if user_id is None:
+        logger.debug("No user_id in token payload")
+        raise credentials_exception
+    user = principal_cache.get(user_id)
+    if user is None:
+        user = await load_principal(user_id)
+        if user is None:
+            logger.debug("User %s not found", user_id)
+            raise credentials_exception
+        principal_cache.set(user_id, user)
+    if not user.get("is_active", True):
+        logger.debug("User %s inactive", user_id)
+        raise credentials_exception
+    await admission.admit_principal(user_id)
+    return dict(user)
+
+async def get_current_stream_user(token: Optional[str] = Depends(optional_oauth2_scheme), access_token: Optional[str] = None):
+    # Browsers' EventSource cannot set headers, so streams also accept ?access_token=,
+    # but only a stream token from POST /events/token.
+    if token:
+        return await authenticate(token)
+    return await authenticate(access_token or "", STREAM_TOKEN_SCOPE)
 
 def get_current_admin_user(user=Depends(get_current_user)):
     if "admin" not in user.get("roles", []):
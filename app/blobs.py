@@ -0,0 +1,267 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import uuid
+from datetime import datetime
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+from app.db import get_database
+
+logger = logging.getLogger(__name__)
+
+BLOB_COLLECTION = "blobs"
+# "gridfs" keeps content in MongoDB next to its metadata. "filesystem" stores files under
+# BLOB_ROOT and only suits a single instance with persistent disk: on Cloud Run the
+# container disk is per instance and lost on restart.
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "gridfs")
+BLOB_ROOT = os.getenv("BLOB_ROOT", "data/blobs")
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(50 * 1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+SHA256 = re.compile(r"[0-9a-f]{64}")
+DATA_URI = re.compile(r"data:([\w.+-]+/[\w.+-]+)?(;[\w=.+-]+)*;base64,", re.ASCII)
+
+
+def blob_ref(sha: str) -> str:
+    """The compact reference stored in `evidence`/`snapshots` lists; also the download path."""
+    return f"/blobs/{sha}"
+
+
+class FilesystemWriter:
+    def __init__(self, root: str):
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        self.root = root
+        self.path = os.path.join(root, "tmp", uuid.uuid4().hex)
+        self.file = open(self.path, "wb")
+
+    async def write(self, chunk: bytes):
+        await asyncio.to_thread(self.file.write, chunk)
+
+    async def commit(self, sha: str):
+        self.file.close()
+        target = FilesystemBackend.path(self.root, sha)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Same name means same content, so replacing an existing file is harmless.
+        os.replace(self.path, target)
+        return None
+
+    async def abort(self):
+        self.file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class FilesystemBackend:
+    name = "filesystem"
+
+    def __init__(self, root: str = BLOB_ROOT):
+        self.root = root
+
+    @staticmethod
+    def path(root: str, sha: str) -> str:
+        return os.path.join(root, sha[:2], sha[2:4], sha)
+
+    async def writer(self):
+        return FilesystemWriter(self.root)
+
+    async def discard(self, blob: dict):
+        pass
+
+    async def exists(self, blob: dict) -> bool:
+        return blob.get("backend") == self.name and os.path.exists(self.path(self.root, blob["_id"]))
+
+    async def read(self, blob: dict, start: int, end: int):
+        with open(self.path(self.root, blob["_id"]), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class GridFSWriter:
+    def __init__(self, bucket):
+        self.stream = bucket.open_upload_stream(uuid.uuid4().hex, chunk_size_bytes=CHUNK_SIZE)
+
+    async def write(self, chunk: bytes):
+        await self.stream.write(chunk)
+
+    async def commit(self, sha: str):
+        await self.stream.close()
+        return self.stream._id
+
+    async def abort(self):
+        await self.stream.abort()
+
+
+class GridFSBackend:
+    name = "gridfs"
+
+    def __init__(self):
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(get_database(), bucket_name=BLOB_COLLECTION)
+        return self._bucket
+
+    async def writer(self):
+        return GridFSWriter(self.bucket)
+
+    async def discard(self, blob: dict):
+        await self.bucket.delete(blob["location"])
+
+    async def exists(self, blob: dict) -> bool:
+        # GridFS content is written before its metadata, so only a backend switch can lose it.
+        return blob.get("backend") == self.name and blob.get("location") is not None
+
+    async def read(self, blob: dict, start: int, end: int):
+        stream = await self.bucket.open_download_stream(blob["location"])
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class BlobStore:
+    """Content-addressed blobs: the SHA-256 of the bytes is the id, so identical uploads are stored once."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.uploads = 0
+        self.deduplicated = 0
+        self.repaired = 0
+
+    @property
+    def collection(self):
+        return get_database()[BLOB_COLLECTION]
+
+    async def put(self, chunks, content_type: str = None):
+        """Store an async iterable of byte chunks; return (metadata, created)."""
+        hasher = hashlib.sha256()
+        size = 0
+        writer = await self.backend.writer()
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > BLOB_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Blob exceeds {BLOB_MAX_BYTES} bytes")
+                hasher.update(chunk)
+                await writer.write(chunk)
+        except BaseException:
+            await writer.abort()
+            raise
+        sha = hasher.hexdigest()
+        self.uploads += 1
+        existing = await self.collection.find_one({"_id": sha})
+        if existing and await self.backend.exists(existing):
+            await writer.abort()
+            self.deduplicated += 1
+            return existing, False
+        if existing:
+            # Metadata survived but the content did not (another instance's disk, a
+            # restart, a backend switch); keep the bytes just uploaded.
+            repaired = {"backend": self.backend.name, "location": await writer.commit(sha)}
+            await self.collection.update_one({"_id": sha}, {"$set": repaired})
+            self.repaired += 1
+            return {**existing, **repaired}, False
+        blob = {
+            "_id": sha,
+            "size": size,
+            "content_type": content_type or "application/octet-stream",
+            "backend": self.backend.name,
+            "location": await writer.commit(sha),
+            "created_at": datetime.utcnow().replace(microsecond=0),
+        }
+        try:
+            await self.collection.insert_one(blob)
+        except DuplicateKeyError:
+            # A concurrent upload of the same bytes won the race.
+            await self.backend.discard(blob)
+            self.deduplicated += 1
+            return await self.collection.find_one({"_id": sha}), False
+        return blob, True
+
+    async def put_bytes(self, data: bytes, content_type: str = None):
+        async def chunks():
+            for offset in range(0, len(data), CHUNK_SIZE):
+                yield data[offset:offset + CHUNK_SIZE]
+        return await self.put(chunks(), content_type)
+
+    async def get(self, sha: str) -> dict:
+        blob = await self.collection.find_one({"_id": sha}) if SHA256.fullmatch(sha) else None
+        if not blob:
+            raise HTTPException(status_code=404, detail="Blob not found")
+        # Check before streaming starts; a missing file would otherwise truncate a 200.
+        if not await self.backend.exists(blob):
+            raise HTTPException(status_code=503, detail="Blob content is not available; upload it again to restore it")
+        return blob
+
+    def read(self, blob: dict, start: int, end: int):
+        return self.backend.read(blob, start, end)
+
+    async def externalize(self, values):
+        """Replace inline base64 `data:` URIs with references to stored blobs; other values pass through."""
+        if not values:
+            return values
+        refs = []
+        for value in values:
+            match = DATA_URI.match(value) if isinstance(value, str) else None
+            if match is None:
+                refs.append(value)
+                continue
+            try:
+                data = base64.b64decode(value[match.end():], validate=True)
+            except (binascii.Error, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid base64 data URI")
+            blob, _ = await self.put_bytes(data, match.group(1))
+            refs.append(blob_ref(blob["_id"]))
+        return refs
+
+    async def externalize_field(self, doc: dict, field: str):
+        if doc.get(field):
+            doc[field] = await self.externalize(doc[field])
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "uploads": self.uploads,
+            "deduplicated": self.deduplicated,
+            "repaired": self.repaired,
+        }
+
+
+def parse_range(header: str, size: int):
+    """Return (start, end) for a single `bytes=` range, None to serve the whole blob, or raise 416."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        # Multiple ranges are allowed to be ignored (RFC 9110 14.2).
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+blob_store = BlobStore(GridFSBackend() if BLOB_BACKEND == "gridfs" else FilesystemBackend())
@@ -0,0 +1,67 @@
+import asyncio
+import os
+from typing import Optional
+from fastapi import HTTPException
+
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", "500"))
+
+
+def parse_ids(ids: str) -> list:
+    """Split `ids=a,b,c` into unique ids, keeping the requested order."""
+    parsed = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not parsed:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per batch")
+    return parsed
+
+
+def parse_expand(expand: Optional[str], relations: dict) -> dict:
+    """Select the requested relations from `relations` ({name: (repository, reference field)})."""
+    if not expand:
+        return {}
+    names = [n.strip() for n in expand.split(",") if n.strip()]
+    unknown = [n for n in names if n not in relations]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot expand {', '.join(unknown)}; expected any of {', '.join(relations)}",
+        )
+    return {n: relations[n] for n in names}
+
+
+def with_reference_fields(fields: Optional[str], relations: dict) -> Optional[str]:
+    # A projection must keep the reference fields or there is nothing to expand.
+    if not fields or not relations:
+        return fields
+    return ",".join([fields, *(field for _, field in relations.values())])
+
+
+class DataLoader:
+    """Request-scoped loader: resolves each repository's ids with one `$in` query and remembers them."""
+
+    def __init__(self):
+        self.loaded = {}
+
+    async def load_many(self, repo, ids) -> dict:
+        cache = self.loaded.setdefault(repo.name, {})
+        wanted = {i for i in ids if isinstance(i, str) and i not in cache}
+        if wanted:
+            found = await repo.get_many(wanted)
+            for i in wanted:
+                cache[i] = found.get(i)
+        return cache
+
+    async def expand(self, docs: list, relations: dict):
+        """Attach the referenced documents under each relation name (None when missing)."""
+        if not docs or not relations:
+            return docs
+        names = list(relations)
+        loaded = await asyncio.gather(*(
+            self.load_many(repo, [doc.get(field) for doc in docs]) for repo, field in relations.values()
+        ))
+        for name, found in zip(names, loaded):
+            field = relations[name][1]
+            for doc in docs:
+                doc[name] = found.get(doc.get(field))
+        return docs
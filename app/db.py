@@ -2,11 +2,38 @@ import motor.motor_asyncio
 import os
 from dotenv import load_dotenv
 import logging
+from app.indexes import ensure_indexes
+from app.metrics import mongo_listeners
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB = os.getenv("MONGO_DB", "parksense")
+ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"
+
+# Pool settings apply per process: with N uvicorn workers the deployment opens up
+# to N * MONGO_MAX_POOL_SIZE connections. Unset variables keep the driver defaults.
+POOL_OPTIONS = {
+    "maxPoolSize": ("MONGO_MAX_POOL_SIZE", int),
+    "minPoolSize": ("MONGO_MIN_POOL_SIZE", int),
+    "maxIdleTimeMS": ("MONGO_MAX_IDLE_TIME_MS", int),
+    "maxConnecting": ("MONGO_MAX_CONNECTING", int),
+    "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+    "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+    "connectTimeoutMS": ("MONGO_CONNECT_TIMEOUT_MS", int),
+    "socketTimeoutMS": ("MONGO_SOCKET_TIMEOUT_MS", int),
+    # e.g. "zstd,zlib"; zstd and snappy need the zstandard / python-snappy packages.
+    "compressors": ("MONGO_COMPRESSORS", str),
+}
+
+
+def client_options() -> dict:
+    options = {}
+    for option, (env, cast) in POOL_OPTIONS.items():
+        value = os.getenv(env)
+        if value:
+            options[option] = cast(value)
+    return options
 
 client = None
 db = None
@@ -19,11 +46,13 @@ db = None
 async def connect_to_mongo():
     global client, db
     try:
-        client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
+        client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI, event_listeners=mongo_listeners, **client_options())
         db = client[MONGO_DB]
         # FastAPI app sends a "ping" command to MongoDB
         await db.command("ping")
-        logging.info("Successfully connected to MongoDB Atlas")
+        logging.info(f"Successfully connected to MongoDB Atlas (pid {os.getpid()}, pool options {client_options()})")
+        if ENSURE_INDEXES:
+            await ensure_indexes(db)
     except Exception as e:
         logging.error(f"Failed to connect to MongoDB: {e}")
         raise
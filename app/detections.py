@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.plates import plate_fields
+from app.repository import DUPLICATE_KEY, VERSION_FIELD, vehicles_repo
+from app.timeutils import naive_utc
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("VEHICLE_DETECTION_FLUSH_SECONDS", "2"))
+MAX_PENDING = int(os.getenv("VEHICLE_DETECTION_MAX_PENDING", "10000"))
+MAX_SNAPSHOTS = int(os.getenv("VEHICLE_MAX_SNAPSHOTS", "20"))
+# An upsert that loses the insert race to another worker fails on the unique plate
+# index; retried, it finds the winner's document and updates it instead.
+UPSERT_ATTEMPTS = 3
+
+ATTRIBUTES = ("make", "model", "color", "tracking")
+
+
+class PendingVehicle:
+    """Detections of one plate merged since the last flush."""
+
+    __slots__ = ("first", "last", "snapshots", "attributes", "count")
+
+    def __init__(self, detected_at: datetime):
+        self.first = detected_at
+        self.last = detected_at
+        self.snapshots = []
+        self.attributes = {}
+        self.count = 0
+
+    def merge(self, detected_at: datetime, snapshots, attributes: dict):
+        self.first = min(self.first, detected_at)
+        self.last = max(self.last, detected_at)
+        self.snapshots.extend(snapshots)
+        del self.snapshots[:-MAX_SNAPSHOTS]
+        for key, value in attributes.items():
+            if value is not None:
+                self.attributes[key] = value
+        self.count += 1
+
+    def absorb(self, other: "PendingVehicle"):
+        self.first = min(self.first, other.first)
+        self.last = max(self.last, other.last)
+        self.snapshots = (other.snapshots + self.snapshots)[-MAX_SNAPSHOTS:]
+        self.attributes = {**other.attributes, **self.attributes}
+        self.count += other.count
+
+
+def upsert_operation(plate: str, pending: PendingVehicle) -> UpdateOne:
+    """Build a pipeline upsert that merges `pending` into the live vehicle with this plate.
+
+    Timestamps only ever widen, the snapshot list keeps the newest MAX_SNAPSHOTS
+    entries and parking_duration_seconds is derived from the stored bounds.
+    """
+    merged = {
+        "first_detected_at": {"$min": [{"$ifNull": ["$first_detected_at", pending.first]}, pending.first]},
+        "last_detected_at": {"$max": [{"$ifNull": ["$last_detected_at", pending.last]}, pending.last]},
+        "snapshots": {"$slice": [
+            {"$concatArrays": [{"$ifNull": ["$snapshots", []]}, {"$literal": pending.snapshots}]},
+            -MAX_SNAPSHOTS,
+        ]},
+        VERSION_FIELD: {"$add": [{"$ifNull": [f"${VERSION_FIELD}", 0]}, 1]},
+        **{key: {"$literal": value} for key, value in plate_fields(plate).items()},
+    }
+    for key in ATTRIBUTES:
+        if key in pending.attributes:
+            merged[key] = {"$literal": pending.attributes[key]}
+        else:
+            merged[key] = {"$ifNull": [f"${key}", None]}
+    duration = {"$toLong": {"$divide": [{"$subtract": ["$last_detected_at", "$first_detected_at"]}, 1000]}}
+    return UpdateOne(
+        {"license_plate": plate, "is_deleted": False},
+        [{"$set": merged}, {"$set": {"parking_duration_seconds": duration}}],
+        upsert=True,
+    )
+
+
+class DetectionBuffer:
+    """Coalesces vehicle detections per license plate and upserts them in one bulk_write per interval."""
+
+    def __init__(self, interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = {}
+        self.received = 0
+        self.flushed = 0
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+
+    async def add(self, detection):
+        detected_at = naive_utc(detection.detected_at) if detection.detected_at else datetime.utcnow()
+        attributes = {key: getattr(detection, key) for key in ATTRIBUTES}
+        entry = self.pending.get(detection.license_plate)
+        if entry is None:
+            entry = self.pending[detection.license_plate] = PendingVehicle(detected_at)
+        entry.merge(detected_at, detection.snapshots, attributes)
+        self.received += 1
+        if len(self.pending) >= self.max_pending:
+            # Apply backpressure to the caller instead of growing without bound.
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+            failed = await self._upsert(batch)
+            if failed:
+                for plate in failed:
+                    current = self.pending.get(plate)
+                    if current is None:
+                        self.pending[plate] = batch[plate]
+                    else:
+                        current.absorb(batch[plate])
+            written = len(batch) - len(failed)
+            self.flushed += written
+            return written
+
+    async def _upsert(self, batch: dict) -> list:
+        """Upsert every plate in `batch`; return the plates that could not be written."""
+        plates = list(batch)
+        for attempt in range(UPSERT_ATTEMPTS):
+            try:
+                await vehicles_repo.bulk_write([upsert_operation(plate, batch[plate]) for plate in plates])
+                return []
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                # Unordered, so everything else in the batch was applied.
+                plates = [plates[err["index"]] for err in errors]
+                if any(err["code"] != DUPLICATE_KEY for err in errors):
+                    logger.error(f"Vehicle detection flush failed, requeueing {len(plates)} plates: {e}")
+                    return plates
+            except Exception as e:
+                logger.error(f"Vehicle detection flush failed, requeueing {len(plates)} plates: {e}")
+                return plates
+        logger.error(f"Vehicle detection upserts kept conflicting, requeueing {len(plates)} plates")
+        return plates
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Vehicle detection flusher error: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending_plates": len(self.pending),
+            "received": self.received,
+            "flushed_upserts": self.flushed,
+            "flush_interval": self.interval,
+        }
+
+
+detection_buffer = DetectionBuffer()
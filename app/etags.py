@@ -0,0 +1,93 @@
+import hashlib
+import os
+import time
+import uuid
+from typing import Optional
+from fastapi import Request, Response
+from app.cache import TTLCache
+from app.repository import VERSION_FIELD, Repository
+from app.serialization import dumps
+
+# Write generations are per process, so list ETags also carry a boot id (a restarted
+# or different worker never matches) and a time window that bounds how long writes
+# made by other workers can go unnoticed.
+BOOT_ID = uuid.uuid4().hex[:8]
+ETAG_WINDOW = int(os.getenv("ETAG_WINDOW_SECONDS", "30"))
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+# Read-mostly collections whose documents are served from memory, not just their ETags.
+RESPONSE_CACHE_COLLECTIONS = {
+    c.strip() for c in os.getenv("RESPONSE_CACHE_COLLECTIONS", "zones,cameras").split(",") if c.strip()
+}
+
+# (collection, id, fields) -> (generation, etag, document or None)
+entity_cache = TTLCache(maxsize=ENTITY_CACHE_SIZE, ttl=ETAG_WINDOW)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison against If-None-Match, as RFC 9110 requires for GET."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def with_etag(result, response: Response, etag: str):
+    # Routes return either a Response (fields / fast JSON) or a model the framework serializes.
+    if isinstance(result, Response):
+        result.headers["ETag"] = etag
+    else:
+        response.headers["ETag"] = etag
+    return result
+
+
+def _digest(value, length: int) -> str:
+    data = value if isinstance(value, bytes) else str(value).encode()
+    return hashlib.sha1(data).hexdigest()[:length]
+
+
+def document_etag(doc: dict, fields: Optional[str] = None) -> str:
+    """Strong ETag from the document's version; unversioned documents hash their content."""
+    version = doc.get(VERSION_FIELD)
+    if version is None:
+        return f'"{_digest(dumps(doc), 24)}"'
+    tag = f'{doc["_id"]}.{version}'
+    if fields:
+        tag += f".{_digest(fields, 8)}"
+    return f'"{tag}"'
+
+
+def list_etag(repo: Repository, request: Request, related=()) -> str:
+    """`related` lists the repositories whose documents are embedded (expanded) in the page."""
+    window = int(time.time()) // ETAG_WINDOW
+    params = _digest(sorted(request.query_params.multi_items()), 12)
+    generations = "-".join(str(r.generation) for r in (repo, *related))
+    return f'W/"{BOOT_ID}.{repo.name}.{generations}.{window}.{params}"'
+
+
+async def conditional_get(repo: Repository, doc_id: str, fields: Optional[str], request: Request):
+    """Return (doc, etag); doc is None when the client's copy is current (answer 304).
+
+    A remembered ETag for an unchanged generation lets revalidations skip MongoDB,
+    and for RESPONSE_CACHE_COLLECTIONS the document itself is served from memory.
+    """
+    key = (repo.name, doc_id, fields)
+    generation = repo.generation
+    cached = entity_cache.get(key)
+    if cached is not None and cached[0] == generation:
+        _, etag, doc = cached
+        if etag_matches(request, etag):
+            return None, etag
+        if doc is not None:
+            return dict(doc), etag
+    doc = await repo.get(doc_id, fields)
+    etag = document_etag(doc, fields)
+    # Keyed on the generation read before the query, so a concurrent write invalidates it.
+    entity_cache.set(key, (generation, etag, dict(doc) if repo.name in RESPONSE_CACHE_COLLECTIONS else None))
+    if etag_matches(request, etag):
+        return None, etag
+    return doc, etag
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from app.repository import cameras_repo, parking_spaces_repo, violations_repo
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+# "local" publishes from the write handlers of this process; "change_stream" tails
+# Mongo change streams so every worker sees every write (requires a replica set).
+EVENTS_SOURCE = os.getenv("EVENTS_SOURCE", "local")
+
+ENTITY_REPOSITORIES = {
+    "parking_space": parking_spaces_repo,
+    "violation": violations_repo,
+    "camera": cameras_repo,
+}
+WATCHED_COLLECTIONS = {repo.name: entity for entity, repo in ENTITY_REPOSITORIES.items()}
+
+
+class Subscription:
+    """A bounded per-client queue.
+
+    Pending events for the same entity are coalesced so a slow consumer only sees
+    the latest state of each document; once the queue is full the oldest event
+    is dropped.
+    """
+
+    def __init__(self, entities: Optional[set] = None, zone_ids: Optional[set] = None,
+                 maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.entities = entities
+        self.zone_ids = zone_ids
+        self.maxsize = maxsize
+        self.pending = OrderedDict()
+        self.wakeup = asyncio.Event()
+        self.coalesced = 0
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        if self.entities and event["entity"] not in self.entities:
+            return False
+        if self.zone_ids and event.get("zone_id") not in self.zone_ids:
+            return False
+        return True
+
+    def offer(self, event: dict):
+        key = (event["entity"], event["id"])
+        if key in self.pending:
+            self.coalesced += 1
+            del self.pending[key]
+        elif len(self.pending) >= self.maxsize:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.pending[key] = event
+        self.wakeup.set()
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        if not self.pending:
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        _, event = self.pending.popitem(last=False)
+        return event
+
+
+class Broker:
+    """In-process publish/subscribe fan-out for entity change events."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.published = 0
+        self._watch_task = None
+
+    def subscribe(self, entities=None, zone_ids=None) -> Subscription:
+        subscription = Subscription(entities, zone_ids)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, entity: str, action: str, doc: dict):
+        # Every event source (routes, sweeper, change streams) ends up here, so hidden
+        # fields are dropped once for all of them.
+        doc = ENTITY_REPOSITORIES[entity].public(doc)
+        event = {
+            "entity": entity,
+            "action": action,
+            "id": str(doc.get("_id")),
+            "zone_id": doc.get("zone_id"),
+            "at": datetime.utcnow(),
+            "data": doc if action != "deleted" else None,
+        }
+        self.published += 1
+        for subscription in self.subscribers:
+            if subscription.matches(event):
+                subscription.offer(event)
+
+    def publish_local(self, entity: str, action: str, doc: dict):
+        """Publish from a write handler unless change streams already deliver the event."""
+        if self._watch_task is None:
+            self.publish(entity, action, doc)
+
+    async def _watch(self, db):
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": list(WATCHED_COLLECTIONS)},
+            "operationType": {"$in": ["insert", "update", "replace"]},
+        }}]
+        async with db.watch(pipeline, full_document="updateLookup") as stream:
+            async for change in stream:
+                doc = change.get("fullDocument")
+                if not doc:
+                    continue
+                doc["_id"] = str(doc["_id"])
+                entity = WATCHED_COLLECTIONS[change["ns"]["coll"]]
+                if doc.get("is_deleted"):
+                    action = "deleted"
+                elif change["operationType"] == "insert":
+                    action = "created"
+                else:
+                    action = "updated"
+                self.publish(entity, action, doc)
+
+    async def _run_watch(self, db):
+        try:
+            await self._watch(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Change stream unavailable, falling back to local events: {e}")
+        finally:
+            self._watch_task = None
+
+    def start(self, db):
+        if EVENTS_SOURCE == "change_stream" and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._run_watch(db))
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    def stats(self):
+        return {
+            "source": "change_stream" if self._watch_task is not None else "local",
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in self.subscribers),
+            "coalesced": sum(s.coalesced for s in self.subscribers),
+        }
+
+
+broker = Broker()
@@ -0,0 +1,86 @@
+import csv
+import io
+import os
+import zlib
+from datetime import date, datetime
+from typing import Optional
+from fastapi.responses import StreamingResponse
+from app.repository import Repository, parse_fields
+from app.serialization import dumps
+
+# Documents fetched per getMore and encoded per chunk; memory stays bounded by one batch.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode()
+    return str(value)
+
+
+def _csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _encode(docs: list, format: str, columns: list) -> bytes:
+    if format == "csv":
+        return _csv([_cell(doc.get(c)) for c in columns] for doc in docs)
+    return b"".join(dumps(doc) + b"\n" for doc in docs)
+
+
+async def _chunks(cursor, format: str, columns: list):
+    if format == "csv":
+        yield _csv([columns])
+    batch = []
+    try:
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                # Each yield waits for the client to take the chunk, which gives the
+                # event loop back between batches and applies backpressure.
+                yield _encode(batch, format, columns)
+                batch = []
+        if batch:
+            yield _encode(batch, format, columns)
+    finally:
+        await cursor.close()
+
+
+async def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(repo: Repository, date_field: str, columns: list, start: Optional[datetime], end: Optional[datetime],
+           format: str = "csv", fields: Optional[str] = None, gzip: bool = False) -> StreamingResponse:
+    """Stream live documents with `start <= date_field < end` in date order as CSV or NDJSON.
+
+    `columns` is the default projection (and CSV header); `fields=a,b` narrows it.
+    """
+    requested = [c for c in parse_fields(fields) or {} if c not in repo.hidden]
+    projection = {c: 1 for c in requested or columns}
+    columns = ["_id", *(c for c in projection if c != "_id")]
+    query = {"is_deleted": False}
+    bounds = {op: value for op, value in (("$gte", start), ("$lt", end)) if value is not None}
+    if bounds:
+        query[date_field] = bounds
+    cursor = repo.collection.find(query, projection, batch_size=EXPORT_BATCH_SIZE).sort(
+        [(date_field, 1), ("_id", 1)]
+    )
+    body = _chunks(cursor, format, columns)
+    headers = {"Content-Disposition": f'attachment; filename="{repo.name}.{format}"'}
+    if gzip:
+        body = _gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
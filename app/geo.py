@@ -0,0 +1,193 @@
+import logging
+import math
+import os
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+GRID_CELL_DEGREES = float(os.getenv("ZONE_GRID_CELL_DEGREES", "0.01"))
+# Zones whose bounding box spans more cells than this are checked for every point
+# instead of being registered cell by cell.
+MAX_CELLS_PER_ZONE = int(os.getenv("ZONE_GRID_MAX_CELLS", "4096"))
+
+
+def _validate_ring(ring):
+    if not isinstance(ring, list) or len(ring) < 4:
+        raise ValueError("each linear ring needs at least 4 positions")
+    for position in ring:
+        if not isinstance(position, (list, tuple)) or len(position) < 2:
+            raise ValueError("positions must be [longitude, latitude]")
+        lon, lat = position[0], position[1]
+        if not isinstance(lon, (int, float)) or not isinstance(lat, (int, float)):
+            raise ValueError("coordinates must be numbers")
+        if not -180 <= lon <= 180 or not -90 <= lat <= 90:
+            raise ValueError("coordinates out of range")
+    if list(ring[0][:2]) != list(ring[-1][:2]):
+        raise ValueError("linear rings must be closed")
+    if _self_intersects([(p[0], p[1]) for p in ring]):
+        raise ValueError("linear rings must not intersect themselves")
+
+
+def _orientation(a, b, c) -> int:
+    cross = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return (cross > 0) - (cross < 0)
+
+
+def _on_segment(a, b, p) -> bool:
+    return (_orientation(a, b, p) == 0 and min(a[0], b[0]) <= p[0] <= max(a[0], b[0])
+            and min(a[1], b[1]) <= p[1] <= max(a[1], b[1]))
+
+
+def _segments_touch(a, b, c, d) -> bool:
+    o1, o2, o3, o4 = _orientation(a, b, c), _orientation(a, b, d), _orientation(c, d, a), _orientation(c, d, b)
+    if o1 != o2 and o3 != o4 and 0 not in (o1, o2, o3, o4):
+        return True
+    return _on_segment(a, b, c) or _on_segment(a, b, d) or _on_segment(c, d, a) or _on_segment(c, d, b)
+
+
+def _self_intersects(ring) -> bool:
+    """Whether any two edges of a closed ring cross or touch, other than neighbours at their shared vertex.
+
+    MongoDB's 2dsphere index refuses such rings; checking here turns that into a
+    validation error. Edges are compared pairwise, which is fine for zone-sized rings.
+    """
+    # Repeated consecutive positions are harmless and would look like touching edges.
+    points = [p for i, p in enumerate(ring) if i == 0 or p != ring[i - 1]]
+    edges = list(zip(points, points[1:]))
+    count = len(edges)
+    if count < 3:
+        # Fewer than three distinct edges collapse onto themselves.
+        return True
+    for i in range(count):
+        a, b = edges[i]
+        for j in range(i + 1, count):
+            c, d = edges[j]
+            if j == i + 1 or (i == 0 and j == count - 1):
+                # Neighbours share one vertex; they are only invalid if they fold back over each other.
+                far, other = (d, a) if j == i + 1 else (c, b)
+                if _on_segment(c, d, other) or _on_segment(a, b, far):
+                    return True
+                continue
+            if _segments_touch(a, b, c, d):
+                return True
+    return False
+
+
+def validate_geojson(geometry):
+    """Check that `geometry` is a GeoJSON Polygon or MultiPolygon and return it."""
+    if not isinstance(geometry, dict):
+        raise ValueError("boundaries must be a GeoJSON object")
+    kind = geometry.get("type")
+    coordinates = geometry.get("coordinates")
+    if kind == "Polygon":
+        polygons = [coordinates]
+    elif kind == "MultiPolygon":
+        polygons = coordinates
+    else:
+        raise ValueError("boundaries must be a GeoJSON Polygon or MultiPolygon")
+    if not isinstance(polygons, list) or not polygons:
+        raise ValueError("boundaries has no coordinates")
+    for polygon in polygons:
+        if not isinstance(polygon, list) or not polygon:
+            raise ValueError("each polygon needs an exterior ring")
+        for ring in polygon:
+            _validate_ring(ring)
+    return geometry
+
+
+def _polygons(geometry):
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    return geometry["coordinates"]
+
+
+def _in_ring(lon, lat, ring) -> bool:
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class ZoneShape:
+    __slots__ = ("zone_id", "name", "polygons", "bbox")
+
+    def __init__(self, zone_id: str, name: str, geometry: dict):
+        self.zone_id = zone_id
+        self.name = name
+        self.polygons = _polygons(geometry)
+        lons = [p[0] for polygon in self.polygons for p in polygon[0]]
+        lats = [p[1] for polygon in self.polygons for p in polygon[0]]
+        self.bbox = (min(lons), min(lats), max(lons), max(lats))
+
+    def contains(self, lon: float, lat: float) -> bool:
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+            return False
+        for exterior, *holes in self.polygons:
+            if _in_ring(lon, lat, exterior) and not any(_in_ring(lon, lat, hole) for hole in holes):
+                return True
+        return False
+
+
+class ZoneIndex:
+    """Uniform grid over zone bounding boxes with exact point-in-polygon refinement."""
+
+    def __init__(self, cell: float = GRID_CELL_DEGREES):
+        self.cell = cell
+        self.shapes = {}
+        self.grid = defaultdict(set)
+        self.zone_cells = {}
+        self.large = set()
+        self.ready = False
+
+    def _cell(self, lon: float, lat: float):
+        return math.floor(lon / self.cell), math.floor(lat / self.cell)
+
+    async def warm(self, db):
+        self.shapes.clear()
+        self.grid.clear()
+        self.zone_cells.clear()
+        self.large.clear()
+        skipped = 0
+        async for z in db["zones"].find({"is_deleted": False}, {"name": 1, "boundaries": 1}):
+            try:
+                self.set(str(z["_id"]), z.get("name"), z.get("boundaries"))
+            except (ValueError, KeyError, TypeError):
+                skipped += 1
+        self.ready = True
+        logger.info(f"Zone index built with {len(self.shapes)} zones ({skipped} without valid GeoJSON)")
+
+    def set(self, zone_id: str, name: str, geometry: dict):
+        self.remove(zone_id)
+        shape = ZoneShape(zone_id, name, validate_geojson(geometry))
+        self.shapes[zone_id] = shape
+        min_x, min_y = self._cell(shape.bbox[0], shape.bbox[1])
+        max_x, max_y = self._cell(shape.bbox[2], shape.bbox[3])
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > MAX_CELLS_PER_ZONE:
+            self.large.add(zone_id)
+            return
+        cells = [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+        for cell in cells:
+            self.grid[cell].add(zone_id)
+        self.zone_cells[zone_id] = cells
+
+    def remove(self, zone_id: str):
+        self.shapes.pop(zone_id, None)
+        self.large.discard(zone_id)
+        for cell in self.zone_cells.pop(zone_id, ()):
+            members = self.grid[cell]
+            members.discard(zone_id)
+            if not members:
+                del self.grid[cell]
+
+    def locate(self, lon: float, lat: float):
+        candidates = self.grid.get(self._cell(lon, lat), set()) | self.large
+        return [self.shapes[zone_id] for zone_id in candidates if self.shapes[zone_id].contains(lon, lat)]
+
+
+zone_index = ZoneIndex()
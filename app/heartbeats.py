@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from app.events import broker
+from app.repository import BUMP_VERSION, cameras_repo
+from app.timeutils import naive_utc
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("CAMERA_HEARTBEAT_FLUSH_SECONDS", "5"))
+STALE_AFTER = float(os.getenv("CAMERA_HEARTBEAT_STALE_SECONDS", "60"))
+OFFLINE = "offline"
+
+
+class CameraState:
+    __slots__ = ("camera_id", "name", "zone_id", "status", "health", "last_seen")
+
+    def __init__(self, camera_id: str, name: str, zone_id: str, status: str, health, last_seen):
+        self.camera_id = camera_id
+        self.name = name
+        self.zone_id = zone_id
+        self.status = status
+        self.health = health
+        self.last_seen = last_seen
+
+    def stale(self, now: datetime) -> bool:
+        # Cameras that never sent a heartbeat keep whatever status was written for them.
+        return self.last_seen is not None and (now - self.last_seen).total_seconds() > STALE_AFTER
+
+    def document(self) -> dict:
+        return {
+            "_id": self.camera_id,
+            "name": self.name,
+            "zone_id": self.zone_id,
+            "status": self.status,
+            "health": self.health,
+            "last_heartbeat_at": self.last_seen,
+        }
+
+
+class HeartbeatBuffer:
+    """Latest camera health kept in memory and written back to `cameras` in one bulk_write per interval.
+
+    Like the occupancy engine, state is per process and only sees heartbeats sent
+    to this process; writes are conditional on the stored heartbeat being older.
+    """
+
+    def __init__(self, interval: float = FLUSH_INTERVAL):
+        self.interval = interval
+        self.cameras = {}
+        self.dirty = set()
+        self.received = 0
+        self.flushed = 0
+        self.marked_offline = 0
+        self.ready = False
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+
+    async def warm(self, db):
+        self.cameras.clear()
+        fields = {"name": 1, "zone_id": 1, "status": 1, "health": 1, "last_heartbeat_at": 1}
+        async for cam in db["cameras"].find({"is_deleted": False}, fields):
+            self.register(cam)
+        self.ready = True
+        logger.info(f"Camera health loaded for {len(self.cameras)} cameras")
+
+    def register(self, cam: dict):
+        """Track a camera created or rewritten through the CRUD handlers."""
+        camera_id = str(cam["_id"])
+        current = self.cameras.get(camera_id)
+        self.cameras[camera_id] = CameraState(
+            camera_id, cam.get("name"), cam.get("zone_id"), cam.get("status"), cam.get("health"),
+            cam.get("last_heartbeat_at") or (current.last_seen if current else None),
+        )
+
+    def remove(self, camera_id: str):
+        self.cameras.pop(camera_id, None)
+        self.dirty.discard(camera_id)
+
+    async def beat(self, camera_id: str, status: str, health, at: datetime = None):
+        state = self.cameras.get(camera_id)
+        if state is None:
+            # Unknown to this process (or a non-canonical id); resolve once, 404 if missing.
+            cam = await cameras_repo.get(camera_id)
+            self.register(cam)
+            state = self.cameras[cam["_id"]]
+        changed = state.status != status
+        state.status = status
+        if health is not None:
+            state.health = health
+        state.last_seen = naive_utc(at) if at else datetime.utcnow()
+        self.dirty.add(state.camera_id)
+        self.received += 1
+        if changed:
+            broker.publish_local("camera", "updated", state.document())
+
+    def mark_stale(self, now: datetime) -> int:
+        marked = 0
+        for state in self.cameras.values():
+            if state.status != OFFLINE and state.stale(now):
+                state.status = OFFLINE
+                self.dirty.add(state.camera_id)
+                broker.publish_local("camera", "updated", state.document())
+                marked += 1
+        self.marked_offline += marked
+        return marked
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.dirty:
+                return 0
+            batch, self.dirty = self.dirty, set()
+            ops = []
+            for camera_id in batch:
+                state = self.cameras.get(camera_id)
+                if state is not None:
+                    # Heartbeats for one camera can land on several workers; never overwrite a
+                    # newer one, so a worker that stopped hearing from a camera cannot mark it
+                    # offline while another worker is still receiving its heartbeats.
+                    query = cameras_repo.id_query(camera_id)
+                    if state.last_seen is not None:
+                        query["last_heartbeat_at"] = {"$not": {"$gt": state.last_seen}}
+                    ops.append(UpdateOne(
+                        query,
+                        {"$set": {"status": state.status, "health": state.health, "last_heartbeat_at": state.last_seen},
+                         "$inc": BUMP_VERSION},
+                    ))
+            try:
+                await cameras_repo.bulk_write(ops)
+            except Exception as e:
+                logger.error(f"Camera heartbeat flush failed, requeueing {len(batch)} cameras: {e}")
+                self.dirty |= batch
+                return 0
+            self.flushed += len(ops)
+            return len(ops)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.mark_stale(datetime.utcnow())
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Camera heartbeat flusher error: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def health(self, zone_id: str = None, status: str = None):
+        now = datetime.utcnow()
+        cameras = []
+        counts = {}
+        for state in self.cameras.values():
+            effective = OFFLINE if state.stale(now) else state.status
+            if zone_id and state.zone_id != zone_id:
+                continue
+            counts[effective] = counts.get(effective, 0) + 1
+            if status and effective != status:
+                continue
+            cameras.append({
+                **state.document(),
+                "status": effective,
+                "stale": state.stale(now),
+                "seconds_since_heartbeat": round((now - state.last_seen).total_seconds(), 1) if state.last_seen else None,
+            })
+        return {"total": sum(counts.values()), "by_status": counts, "stale_after_seconds": STALE_AFTER, "cameras": cameras}
+
+    def stats(self):
+        return {
+            "cameras": len(self.cameras),
+            "pending": len(self.dirty),
+            "received": self.received,
+            "flushed_updates": self.flushed,
+            "marked_offline": self.marked_offline,
+            "flush_interval": self.interval,
+        }
+
+
+camera_heartbeats = HeartbeatBuffer()
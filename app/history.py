@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from app.db import get_database
+from app.occupancy import OCCUPIED_STATUSES
+from app.timeutils import naive_utc
+
+logger = logging.getLogger(__name__)
+
+TRANSITIONS_COLLECTION = "occupancy_transitions"
+# Every transition is folded into each of these bucket sizes as it is recorded.
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+MAX_POINTS = int(os.getenv("OCCUPANCY_HISTORY_MAX_POINTS", "2000"))
+FLUSH_INTERVAL = float(os.getenv("OCCUPANCY_HISTORY_FLUSH_SECONDS", "5"))
+MAX_PENDING = int(os.getenv("OCCUPANCY_HISTORY_MAX_PENDING", "10000"))
+UNITS = {"m": 60, "h": 3600, "d": 86400}
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_collection(resolution: str) -> str:
+    return f"occupancy_history_{resolution}"
+
+
+def _floor(at: datetime, seconds: int) -> datetime:
+    elapsed = int((at - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def _state(doc):
+    if not doc or doc.get("is_deleted"):
+        return None, None
+    return doc.get("zone_id"), doc.get("status")
+
+
+def transitions(before, after, at: datetime):
+    """Status changes between two versions of a parking space; a zone move counts as leave + enter."""
+    (old_zone, old_status), (new_zone, new_status) = _state(before), _state(after)
+    if (old_zone, old_status) == (new_zone, new_status):
+        return []
+    space_id = str((after or before)["_id"])
+    if old_zone == new_zone:
+        return [{"space_id": space_id, "zone_id": new_zone, "from_status": old_status, "to_status": new_status, "at": at}]
+    changes = []
+    if old_zone is not None:
+        changes.append({"space_id": space_id, "zone_id": old_zone, "from_status": old_status, "to_status": None, "at": at})
+    if new_zone is not None:
+        changes.append({"space_id": space_id, "zone_id": new_zone, "from_status": None, "to_status": new_status, "at": at})
+    return changes
+
+
+async def zone_counts(db, zone_ids) -> dict:
+    """{zone_id: (occupied, total)} from the stored parking spaces, shared by every worker."""
+    pipeline = [
+        {"$match": {"is_deleted": False, "zone_id": {"$in": list(zone_ids)}}},
+        {"$group": {
+            "_id": "$zone_id",
+            "total": {"$sum": 1},
+            "occupied": {"$sum": {"$cond": [{"$in": ["$status", list(OCCUPIED_STATUSES)]}, 1, 0]}},
+        }},
+    ]
+    counts = {zone_id: (0, 0) for zone_id in zone_ids}
+    async for row in db["parking_spaces"].aggregate(pipeline):
+        counts[row["_id"]] = (row["occupied"], row["total"])
+    return counts
+
+
+def sample_operation(zone_id: str, occupied: int, total: int, transitions: int, at: datetime, start: datetime):
+    """Fold one occupancy sample into a bucket.
+
+    `occupied_seconds` integrates the occupancy held between the bucket's first and
+    last samples, so averages are weighted by time rather than by sample count. A
+    sample older than the stored one (another worker flushed later) adds no time.
+    """
+    held = {"$max": [0, {"$divide": [{"$subtract": [at, {"$ifNull": ["$sampled_at", at]}]}, 1000]}]}
+    newer = {"$gte": [at, {"$ifNull": ["$sampled_at", at]}]}
+    return UpdateOne(
+        {"zone_id": zone_id, "start": start},
+        [{"$set": {
+            "occupied_seconds": {"$add": [
+                {"$ifNull": ["$occupied_seconds", 0]}, {"$multiply": [{"$ifNull": ["$occupied", 0]}, held]},
+            ]},
+            "first_sampled_at": {"$min": [{"$ifNull": ["$first_sampled_at", at]}, at]},
+            "sampled_at": {"$max": [{"$ifNull": ["$sampled_at", at]}, at]},
+            "occupied_min": {"$min": [{"$ifNull": ["$occupied_min", occupied]}, occupied]},
+            "occupied_max": {"$max": [{"$ifNull": ["$occupied_max", occupied]}, occupied]},
+            "transitions": {"$add": [{"$ifNull": ["$transitions", 0]}, transitions]},
+            "occupied": {"$cond": [newer, occupied, "$occupied"]},
+            "total": {"$cond": [newer, total, "$total"]},
+        }}],
+        upsert=True,
+    )
+
+
+class HistoryRecorder:
+    """Buffers parking space transitions and samples the affected zones once per interval.
+
+    Writes only queue their transitions; the flusher inserts them and folds one
+    occupancy sample per changed zone into every bucket size. Samples are counted
+    from MongoDB rather than this process's occupancy engine, which only sees writes
+    made by this worker.
+    """
+
+    def __init__(self, interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = []
+        # zone_id -> transitions not yet folded into the buckets
+        self.dirty = defaultdict(int)
+        self.recorded = 0
+        self.flushes = 0
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+
+    async def record(self, changes):
+        """Queue the transitions between (before, after) parking space documents; call after writing them."""
+        at = datetime.utcnow()
+        for before, after in changes:
+            for entry in transitions(before, after, at):
+                self.pending.append(entry)
+                self.dirty[entry["zone_id"]] += 1
+                self.recorded += 1
+        if len(self.pending) >= self.max_pending:
+            # Apply backpressure to the caller instead of growing without bound.
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.dirty:
+                return 0
+            entries, self.pending = self.pending, []
+            dirty, self.dirty = self.dirty, defaultdict(int)
+            db = get_database()
+            try:
+                if entries:
+                    await db[TRANSITIONS_COLLECTION].insert_many(entries, ordered=False)
+                    entries = []
+                at = datetime.utcnow()
+                counts = await zone_counts(db, dirty)
+                for resolution, seconds in RESOLUTIONS.items():
+                    start = _floor(at, seconds)
+                    ops = [
+                        sample_operation(zone_id, *counts[zone_id], count, at, start)
+                        for zone_id, count in dirty.items()
+                    ]
+                    await db[bucket_collection(resolution)].bulk_write(ops, ordered=False)
+            except Exception as e:
+                # History is best effort, but keep what failed for the next flush.
+                logger.error(f"Occupancy history flush failed, requeueing {len(dirty)} zones: {e}")
+                self.pending = entries + self.pending
+                for zone_id, count in dirty.items():
+                    self.dirty[zone_id] += count
+                return 0
+            self.flushes += 1
+            return len(dirty)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Occupancy history flusher error: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending_transitions": len(self.pending),
+            "pending_zones": len(self.dirty),
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+            "flush_interval": self.interval,
+        }
+
+
+history_recorder = HistoryRecorder()
+
+
+def parse_resolution(value: str) -> int:
+    match = re.fullmatch(r"(\d+)([mhd])", value or "")
+    seconds = int(match.group(1)) * UNITS[match.group(2)] if match else 0
+    if seconds < RESOLUTIONS["1m"]:
+        raise HTTPException(status_code=400, detail="resolution must look like 1m, 15m, 1h or 1d")
+    return seconds
+
+
+def source_resolution(seconds: int) -> str:
+    """The coarsest stored bucket size that evenly divides the requested step."""
+    candidates = [r for r, size in RESOLUTIONS.items() if size <= seconds and seconds % size == 0]
+    return max(candidates, key=RESOLUTIONS.get)
+
+
+def _point(start: datetime, end: datetime, docs, carry, now: datetime):
+    """Summarize [start, end) from its bucket documents and the occupancy carried in.
+
+    `occupied_avg` is weighted by how long each value held; the time before the first
+    known sample is left out, and the current bucket only counts up to now.
+    """
+    value, total = carry if carry else (None, None)
+    lows, highs = [], []
+    if value is not None and (not docs or docs[0]["first_sampled_at"] > start):
+        lows.append(value)
+        highs.append(value)
+    weighted = known = 0.0
+    cursor = start
+    for d in docs or ():
+        if value is not None:
+            held = max(0.0, (d["first_sampled_at"] - cursor).total_seconds())
+            weighted += value * held
+            known += held
+        weighted += d["occupied_seconds"]
+        known += (d["sampled_at"] - d["first_sampled_at"]).total_seconds()
+        lows.append(d["occupied_min"])
+        highs.append(d["occupied_max"])
+        value, total, cursor = d["occupied"], d["total"], d["sampled_at"]
+    horizon = min(end, now)
+    if value is not None and horizon > cursor:
+        held = (horizon - cursor).total_seconds()
+        weighted += value * held
+        known += held
+    avg = weighted / known if known else value
+    return {
+        "start": start,
+        "occupied": value,
+        "occupied_min": min(lows) if lows else None,
+        "occupied_max": max(highs) if highs else None,
+        "occupied_avg": round(avg, 2) if avg is not None else None,
+        "total": total,
+        "transitions": sum(d["transitions"] for d in docs or ()),
+        "occupancy_rate": round(avg / total, 4) if total and avg is not None else None,
+    }
+
+
+async def query(zone_id: str, start: datetime, end: datetime, resolution: str = None):
+    start, end = naive_utc(start), naive_utc(end)
+    span = (end - start).total_seconds()
+    if span <= 0:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if resolution:
+        step = parse_resolution(resolution)
+    else:
+        fitting = [size for size in sorted(RESOLUTIONS.values()) if span / size <= MAX_POINTS]
+        step = fitting[0] if fitting else RESOLUTIONS["1d"]
+    if span / step > MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Too many points; use a coarser resolution (max {MAX_POINTS})")
+    source = source_resolution(step)
+    collection = get_database()[bucket_collection(source)]
+    first = _floor(start, step)
+    previous = await collection.find_one({"zone_id": zone_id, "start": {"$lt": first}}, sort=[("start", -1)])
+    docs = await collection.find({"zone_id": zone_id, "start": {"$gte": first, "$lt": end}}).sort("start", 1).to_list(length=None)
+    grouped = defaultdict(list)
+    for d in docs:
+        grouped[_floor(d["start"], step)].append(d)
+    carry = (previous["occupied"], previous["total"]) if previous else None
+    points = []
+    bucket = first
+    now = datetime.utcnow()
+    while bucket < end:
+        step_end = bucket + timedelta(seconds=step)
+        point = _point(bucket, step_end, grouped.get(bucket), carry, now)
+        if point["occupied"] is not None:
+            carry = (point["occupied"], point["total"])
+        points.append(point)
+        bucket = step_end
+    return {
+        "zone_id": zone_id,
+        "from": start,
+        "to": end,
+        "resolution": resolution or source,
+        "source": source,
+        "points": points,
+    }
@@ -0,0 +1,137 @@
+import logging
+import os
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Every list query filters on is_deleted=False, so indexes on soft-deletable
+# collections are partial and only cover live documents.
+ACTIVE = {"is_deleted": False}
+
+# Raw transitions and minute buckets are only kept for a while; daily buckets are kept forever.
+DAY = 86400
+HISTORY_RAW_RETENTION = int(os.getenv("OCCUPANCY_HISTORY_RAW_DAYS", "7")) * DAY
+HISTORY_HOURLY_RETENTION = int(os.getenv("OCCUPANCY_HISTORY_HOURLY_DAYS", "365")) * DAY
+
+
+def _active(*keys, **kwargs):
+    return IndexModel(list(keys), partialFilterExpression=ACTIVE, **kwargs)
+
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "zones": [
+        _active(("created_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("name", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("boundaries", GEOSPHERE)),
+    ],
+    "cameras": [
+        _active(("created_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("zone_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)),
+    ],
+    "parking_spaces": [
+        _active(("zone_id", ASCENDING), ("_id", ASCENDING)),
+        _active(("status", ASCENDING), ("zone_id", ASCENDING), ("_id", ASCENDING)),
+        _active(("type", ASCENDING), ("zone_id", ASCENDING), ("_id", ASCENDING)),
+        _active(("status", ASCENDING), ("type", ASCENDING), ("zone_id", ASCENDING), ("_id", ASCENDING)),
+        _active(("status", ASCENDING), ("occupied_since", ASCENDING)),
+    ],
+    "vehicles": [
+        _active(("first_detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("last_detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("license_plate", ASCENDING), ("first_detected_at", DESCENDING), ("_id", DESCENDING)),
+        # One live vehicle per plate, so concurrent detection upserts cannot both insert.
+        _active(("license_plate", ASCENDING), unique=True),
+        _active(("make", ASCENDING), ("model", ASCENDING), ("first_detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("model", ASCENDING), ("first_detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("color", ASCENDING), ("first_detected_at", DESCENDING), ("_id", DESCENDING)),
+        # Multikey index over folded plate trigrams for fuzzy plate search.
+        _active(("plate_trigrams", ASCENDING)),
+    ],
+    "violations": [
+        _active(("detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("zone_id", ASCENDING), ("detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("zone_id", ASCENDING), ("status", ASCENDING), ("detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("car_id", ASCENDING), ("detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("parking_space_id", ASCENDING), ("detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("status", ASCENDING), ("detected_at", DESCENDING), ("_id", DESCENDING)),
+        _active(("type", ASCENDING), ("detected_at", DESCENDING), ("_id", DESCENDING)),
+        # Sweeper-generated violations carry a deterministic key so re-detection is a no-op.
+        IndexModel([("dedupe_key", ASCENDING)], unique=True,
+                   partialFilterExpression={"dedupe_key": {"$exists": True}}),
+    ],
+    "violation_rollups": [
+        IndexModel([("hour", ASCENDING), ("zone_id", ASCENDING), ("type", ASCENDING), ("status", ASCENDING)], unique=True),
+    ],
+    "occupancy_transitions": [
+        IndexModel([("zone_id", ASCENDING), ("at", ASCENDING)]),
+        IndexModel([("at", ASCENDING)], expireAfterSeconds=HISTORY_RAW_RETENTION),
+    ],
+    "occupancy_history_1m": [
+        IndexModel([("zone_id", ASCENDING), ("start", ASCENDING)], unique=True),
+        IndexModel([("start", ASCENDING)], expireAfterSeconds=HISTORY_RAW_RETENTION),
+    ],
+    "occupancy_history_1h": [
+        IndexModel([("zone_id", ASCENDING), ("start", ASCENDING)], unique=True),
+        IndexModel([("start", ASCENDING)], expireAfterSeconds=HISTORY_HOURLY_RETENTION),
+    ],
+    "occupancy_history_1d": [
+        IndexModel([("zone_id", ASCENDING), ("start", ASCENDING)], unique=True),
+    ],
+    # Shared token buckets (ADMISSION_BACKEND=mongo); idle buckets are full again anyway.
+    "rate_limits": [
+        IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=3600),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Create every registered index; existing identical indexes are left untouched."""
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                # Conflicting options or documents the index cannot hold (e.g. legacy
+                # non-GeoJSON zone boundaries); leave it for an operator to reconcile
+                # rather than failing startup.
+                logger.warning(f"Could not ensure index {model.document['name']} on {collection}: {e}")
+
+
+def _keys(model: IndexModel):
+    # Only ordered (1/-1) keys can serve equality filters and sorts.
+    return [field for field, direction in model.document["key"].items() if direction in (ASCENDING, DESCENDING)]
+
+
+def _supports(model: IndexModel, filters: set, sort_by: str) -> bool:
+    keys = _keys(model)
+    if model.document.get("unique") and len(keys) == 1 and keys[0] in filters:
+        return True
+    if sort_by not in keys:
+        return False
+    # Every key before the sort key must be pinned by an equality filter (or the sort needs
+    # a blocking sort), and every filter must be one of those keys (or the index range
+    # covers documents the filter then discards one by one).
+    prefix = keys[:keys.index(sort_by)]
+    return set(prefix) <= filters <= {*prefix, sort_by}
+
+
+def sortable_fields(collection: str):
+    return sorted({k for m in INDEXES.get(collection, []) for k in _keys(m) if k != "_id"})
+
+
+def ensure_query_indexed(collection: str, query: dict, sort_by: str):
+    """Reject filter/sort combinations that no registered index can serve without a scan."""
+    filters = {field for field in query if not field.startswith("$") and field != "is_deleted"}
+    if any(_supports(model, filters, sort_by) for model in INDEXES.get(collection, [])):
+        return
+    raise HTTPException(
+        status_code=400,
+        detail=f"No index serves {collection} filtered by {sorted(filters)} and sorted by '{sort_by}'; "
+               f"sortable fields: {sortable_fields(collection)}",
+    )
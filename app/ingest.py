@@ -0,0 +1,137 @@
+import inspect
+import json
+from fastapi import HTTPException
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.repository import VERSION_FIELD
+
+MAX_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 100
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+class IngestSummary:
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.aborted = None
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def dict(self):
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "aborted": self.aborted,
+        }
+
+
+async def _lines(stream):
+    """Yield (line_number, bytes) from a byte stream, buffering at most one partial line.
+
+    Lines longer than MAX_LINE_BYTES are yielded as None and their remainder skipped.
+    """
+    buffer = b""
+    number = 0
+    skipping = False
+    async for chunk in stream:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for raw in lines:
+            if skipping:
+                skipping = False
+                continue
+            number += 1
+            yield number, raw if len(raw) <= MAX_LINE_BYTES else None
+        if len(buffer) > MAX_LINE_BYTES:
+            if not skipping:
+                number += 1
+                yield number, None
+                skipping = True
+            buffer = b""
+    if buffer.strip() and not skipping:
+        yield number + 1, buffer
+
+
+async def _flush(collection, batch, summary, on_insert) -> bool:
+    """Insert one batch; return False if the database failed and ingest should stop."""
+    docs = [doc for _, doc in batch]
+    failed = {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed[err["index"]] = err.get("errmsg", "write error")
+    except PyMongoError as e:
+        # Earlier batches are already stored; report them instead of failing the request.
+        for line, _ in batch:
+            summary.error(line, f"Batch not written: {e}")
+        summary.aborted = f"Stopped after line {batch[-1][0]}: {e}"
+        return False
+    for index, (line, _) in enumerate(batch):
+        if index in failed:
+            summary.error(line, failed[index])
+    inserted = [doc for index, doc in enumerate(docs) if index not in failed]
+    summary.inserted += len(inserted)
+    if on_insert and inserted:
+        result = on_insert(inserted)
+        if inspect.isawaitable(result):
+            await result
+    return True
+
+
+async def ingest_ndjson(stream, collection, model, batch_size: int, on_insert=None, prepare=None):
+    """Validate NDJSON documents from `stream` and insert them in unordered batches.
+
+    The stream is only read while the current batch is being filled, so a slow
+    database throttles the client (backpressure) and memory stays bounded by one
+    batch regardless of upload size. `prepare` (sync or async) may rewrite each
+    validated document before it is inserted, e.g. to externalize inline blobs; an
+    HTTPException it raises fails that line only. A database error stops the ingest
+    and the summary reports what was stored up to then.
+    """
+    summary = IngestSummary()
+    batch = []
+    async for line, raw in _lines(stream):
+        if raw is None:
+            summary.received += 1
+            summary.error(line, f"Line exceeds {MAX_LINE_BYTES} bytes")
+            continue
+        if not raw.strip():
+            continue
+        summary.received += 1
+        try:
+            doc = model(**json.loads(raw)).dict()
+        except ValidationError as e:
+            summary.error(line, _format_validation_error(e))
+            continue
+        except (ValueError, TypeError) as e:
+            summary.error(line, f"Invalid JSON: {e}")
+            continue
+        if prepare:
+            try:
+                result = prepare(doc)
+                if inspect.isawaitable(result):
+                    await result
+            except HTTPException as e:
+                summary.error(line, str(e.detail))
+                continue
+        doc[VERSION_FIELD] = 1
+        batch.append((line, doc))
+        if len(batch) >= batch_size:
+            if not await _flush(collection, batch, summary, on_insert):
+                return summary.dict()
+            batch = []
+    if batch:
+        await _flush(collection, batch, summary, on_insert)
+    return summary.dict()
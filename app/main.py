@@ -1,15 +1,30 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.db import connect_to_mongo, close_mongo_connection
+from app.db import connect_to_mongo, close_mongo_connection, get_database
+from app.occupancy import occupancy_engine
+from app.detections import detection_buffer
+from app.history import history_recorder
+from app.events import broker
+from app.geo import zone_index
+from app.sweeper import overstay_sweeper
+from app.heartbeats import camera_heartbeats
+from app.metrics import MetricsMiddleware, loop_lag_monitor
+from app.admission import AdmissionMiddleware
 from app.routes.user import router as user_router
 from app.routes.camera import router as camera_router
 from app.routes.zone import router as zone_router
 from app.routes.parking_space import router as parking_space_router
 from app.routes.violation import router as violation_router
 from app.routes.vehicle import router as vehicle_router
+from app.routes.occupancy import router as occupancy_router
+from app.routes.events import router as events_router
+from app.routes.blob import router as blob_router
+from app.routes.metrics import router as metrics_router
 
 app = FastAPI()
 
+# Added first so it runs inside CORS (rejections stay readable by browsers) and metrics.
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"], 
@@ -17,6 +32,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(user_router, prefix="/auth", tags=["auth"])
 app.include_router(camera_router, tags=["cameras"])
@@ -24,14 +40,33 @@ app.include_router(zone_router, tags=["zones"])
 app.include_router(parking_space_router, tags=["parking_spaces"])
 app.include_router(violation_router, tags=["violations"])
 app.include_router(vehicle_router, tags=["vehicles"])
+app.include_router(occupancy_router, tags=["occupancy"])
+app.include_router(events_router, tags=["events"])
+app.include_router(blob_router, tags=["blobs"])
+app.include_router(metrics_router, tags=["metrics"])
 
 @app.on_event("startup")
 async def startup_db_client():
+    loop_lag_monitor.start()
     await connect_to_mongo()
+    await occupancy_engine.warm(get_database())
+    await zone_index.warm(get_database())
+    await camera_heartbeats.warm(get_database())
+    detection_buffer.start()
+    history_recorder.start()
+    camera_heartbeats.start()
+    broker.start(get_database())
+    overstay_sweeper.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await overstay_sweeper.stop()
+    await detection_buffer.stop()
+    await history_recorder.stop()
+    await camera_heartbeats.stop()
+    await broker.stop()
     await close_mongo_connection()
+    await loop_lag_monitor.stop()
 
 @app.get("/health")
 async def health_check():
@@ -39,8 +74,25 @@ async def health_check():
 
 
 import logging
+import re
 
 logging.basicConfig(
     level=logging.INFO,
     format="INFO:     %(message)s",
 )
+
+
+class RedactAccessTokens(logging.Filter):
+    """Keep `access_token=` values out of uvicorn's access log lines."""
+
+    pattern = re.compile(r"(access_token=)[^&\s]*")
+
+    def filter(self, record):
+        if isinstance(record.args, tuple) and len(record.args) >= 3 and isinstance(record.args[2], str):
+            args = list(record.args)
+            args[2] = self.pattern.sub(r"\1[redacted]", args[2])
+            record.args = tuple(args)
+        return True
+
+
+logging.getLogger("uvicorn.access").addFilter(RedactAccessTokens())
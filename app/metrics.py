@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _value(v) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Metric:
+    """Base for the in-process metrics; pymongo listeners call in from Motor's worker threads."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        registry.register(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.values = {}
+        super().__init__(name, help, labelnames)
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels=(), value=0):
+        with self.lock:
+            self.values[labels] = value
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.series = {}
+        super().__init__(name, help, labelnames)
+
+    def observe(self, labels, value: float):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_value(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = {}
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+
+    def register_stats(self, component: str, stats):
+        """Expose the numeric values of a `stats()` dict as `parksense_<component>_<key>` gauges."""
+        self.collectors[component] = stats
+
+    def _collected(self):
+        for component, stats in self.collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Metrics collector {component} failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"parksense_{component}_{key}"
+                yield f"# TYPE {name} gauge"
+                yield f"{name} {_value(value)}"
+
+    def render(self) -> str:
+        lines = [line for metric in self.metrics for line in metric.render()]
+        lines.extend(self._collected())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = Counter("http_requests_total", "HTTP requests by route, method and status.", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+mongo_latency = Histogram("mongo_command_duration_seconds", "MongoDB command latency.", ("command", "collection"), MONGO_BUCKETS)
+mongo_failures = Counter("mongo_command_failures_total", "Failed MongoDB commands.", ("command", "collection"))
+mongo_connections = Gauge("mongo_pool_connections", "Open MongoDB connections.")
+mongo_checked_out = Gauge("mongo_pool_checked_out", "MongoDB connections checked out of the pool.")
+mongo_checkout_failures = Counter("mongo_pool_checkout_failures_total", "Failed pool checkouts by reason.", ("reason",))
+loop_lag = Histogram("event_loop_lag_seconds", "Delay between a scheduled event-loop wakeup and when it ran.", (), LAG_BUCKETS)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streaming responses (SSE, downloads) pass through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            route = scope.get("route")
+            # Label by path template, never the raw path, to keep cardinality bounded.
+            path = getattr(route, "path", "unmatched")
+            http_latency.observe((scope["method"], path), elapsed)
+            http_requests.inc((scope["method"], path, str(status[0])))
+
+
+class CommandTimer(monitoring.CommandListener):
+    def __init__(self):
+        self.collections = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else ""
+        self.collections[(event.connection_id, event.request_id)] = collection
+
+    def _collection(self, event):
+        return self.collections.pop((event.connection_id, event.request_id), "")
+
+    def succeeded(self, event):
+        mongo_latency.observe((event.command_name, self._collection(event)), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collection(event)
+        mongo_latency.observe((event.command_name, collection), event.duration_micros / 1e6)
+        mongo_failures.inc((event.command_name, collection))
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongo_connections.inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_connections.dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        mongo_checkout_failures.inc((str(event.reason),))
+
+    def connection_checked_out(self, event):
+        mongo_checked_out.inc()
+
+    def connection_checked_in(self, event):
+        mongo_checked_out.dec()
+
+
+mongo_listeners = [CommandTimer(), PoolMonitor()]
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.last = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last = max(0.0, loop.time() - expected)
+            loop_lag.observe((), self.last)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {"last_seconds": self.last}
+
+
+loop_lag_monitor = LoopLagMonitor()
+registry.register_stats("event_loop_lag", loop_lag_monitor.stats)
@@ -15,4 +15,18 @@ class CameraCreate(CameraBase):
 
 class Camera(CameraBase):
     id: Optional[str] = Field(alias="_id")
-    created_at: Optional[datetime] = None 
\ No newline at end of file
+    created_at: Optional[datetime] = None
+    last_heartbeat_at: Optional[datetime] = None
+    version: Optional[int] = None
+
+class CameraUpdate(BaseModel):
+    zone_id: str = None
+    name: str = None
+    configuration: Optional[Dict] = None
+    health: Optional[Dict] = None
+    status: str = None
+
+class CameraHeartbeat(BaseModel):
+    status: str = "online"
+    health: Optional[Dict] = None
+    reported_at: Optional[datetime] = None
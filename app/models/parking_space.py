@@ -16,4 +16,15 @@ class ParkingSpaceCreate(ParkingSpaceBase):
     pass
 
 class ParkingSpace(ParkingSpaceBase):
-    id: Optional[str] = Field(alias="_id") 
\ No newline at end of file
+    id: Optional[str] = Field(alias="_id")
+    version: Optional[int] = None
+
+class ParkingSpaceUpdate(BaseModel):
+    # Omitted fields are left unchanged; required fields reject an explicit null.
+    zone_id: str = None
+    type: str = None
+    status: str = None
+    occupied_by_car_id: Optional[str] = None
+    occupied_since: Optional[datetime] = None
+    current_parking_duration_seconds: Optional[int] = None
+    associated_violation_ids: Optional[List[str]] = None
\ No newline at end of file
@@ -18,4 +18,25 @@ class VehicleCreate(VehicleBase):
     pass
 
 class Vehicle(VehicleBase):
-    id: Optional[str] = Field(alias="_id") 
\ No newline at end of file
+    id: Optional[str] = Field(alias="_id") 
+    version: Optional[int] = None
+
+class VehicleUpdate(BaseModel):
+    license_plate: str = None
+    make: Optional[str] = None
+    model: Optional[str] = None
+    color: Optional[str] = None
+    first_detected_at: datetime = None
+    last_detected_at: datetime = None
+    parking_duration_seconds: Optional[int] = None
+    snapshots: Optional[List[str]] = None
+    tracking: Optional[Dict] = None
+
+class VehicleDetection(BaseModel):
+    license_plate: str
+    detected_at: Optional[datetime] = None
+    make: Optional[str] = None
+    model: Optional[str] = None
+    color: Optional[str] = None
+    snapshots: List[str] = []
+    tracking: Optional[Dict] = None
\ No newline at end of file
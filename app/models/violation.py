@@ -20,4 +20,18 @@ class ViolationCreate(ViolationBase):
     pass
 
 class Violation(ViolationBase):
-    id: Optional[str] = Field(alias="_id") 
\ No newline at end of file
+    id: Optional[str] = Field(alias="_id")
+    version: Optional[int] = None
+
+class ViolationUpdate(BaseModel):
+    car_id: str = None
+    parking_space_id: str = None
+    zone_id: str = None
+    type: str = None
+    status: str = None
+    detected_at: datetime = None
+    evidence: List[str] = None
+    verification_details: Optional[Dict] = None
+    verification_history: Optional[List[Dict]] = None
+    enforcement_details: Optional[Dict] = None
+    blockchain_record: Optional[Dict] = None
\ No newline at end of file
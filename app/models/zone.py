@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict
 from datetime import datetime
+from app.geo import validate_geojson
 
 class ZoneBase(BaseModel):
     name: str
@@ -9,8 +10,30 @@ class ZoneBase(BaseModel):
     is_deleted: bool = False
 
 class ZoneCreate(ZoneBase):
-    pass
+    # Only writes are validated so zones stored before boundaries became GeoJSON still load.
+    @field_validator("boundaries")
+    @classmethod
+    def boundaries_must_be_geojson(cls, v):
+        return validate_geojson(v)
 
 class Zone(ZoneBase):
     id: Optional[str] = Field(alias="_id")
-    created_at: Optional[datetime] = None 
\ No newline at end of file
+    created_at: Optional[datetime] = None
+    version: Optional[int] = None
+
+class ZoneUpdate(BaseModel):
+    name: str = None
+    boundaries: Dict = None
+    rules: List[Dict] = None
+
+    @field_validator("boundaries")
+    @classmethod
+    def boundaries_must_be_geojson(cls, v):
+        return validate_geojson(v)
+
+class LocatePoint(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+
+class LocateRequest(BaseModel):
+    points: List[LocatePoint] = Field(max_length=10000)
\ No newline at end of file
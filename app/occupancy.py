@@ -0,0 +1,136 @@
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+OCCUPIED_STATUSES = {"occupied"}
+
+
+class ZoneOccupancy:
+    """Per-zone state: a compact status array plus running counters per status."""
+
+    __slots__ = ("space_ids", "slots", "statuses", "counts")
+
+    def __init__(self):
+        self.space_ids = []
+        self.slots = {}
+        self.statuses = bytearray()
+        self.counts = Counter()
+
+    def set(self, space_id: str, code: int):
+        slot = self.slots.get(space_id)
+        if slot is None:
+            self.slots[space_id] = len(self.space_ids)
+            self.space_ids.append(space_id)
+            self.statuses.append(code)
+        else:
+            self.counts[self.statuses[slot]] -= 1
+            self.statuses[slot] = code
+        self.counts[code] += 1
+
+    def remove(self, space_id: str):
+        slot = self.slots.pop(space_id)
+        self.counts[self.statuses[slot]] -= 1
+        last = len(self.space_ids) - 1
+        if slot != last:
+            # Move the last space into the freed slot so removal stays O(1).
+            moved = self.space_ids[last]
+            self.space_ids[slot] = moved
+            self.statuses[slot] = self.statuses[last]
+            self.slots[moved] = slot
+        self.space_ids.pop()
+        del self.statuses[last]
+
+
+class OccupancyEngine:
+    """Live parking occupancy kept in memory and updated by the parking space handlers.
+
+    State is per process: it is warmed from `parking_spaces` at startup and then
+    only sees writes made through this process.
+    """
+
+    def __init__(self):
+        self.zones = {}
+        self.space_zone = {}
+        self.codes = {}
+        self.names = []
+        self.ready = False
+
+    def _code(self, status: str) -> int:
+        code = self.codes.get(status)
+        if code is None:
+            if len(self.names) >= 256:
+                raise ValueError("Too many distinct parking space statuses")
+            code = len(self.names)
+            self.codes[status] = code
+            self.names.append(status)
+        return code
+
+    async def warm(self, db):
+        self.zones.clear()
+        self.space_zone.clear()
+        cursor = db["parking_spaces"].find({"is_deleted": False}, {"zone_id": 1, "status": 1})
+        async for s in cursor:
+            self.set(str(s["_id"]), s.get("zone_id"), s.get("status"))
+        self.ready = True
+        logger.info(f"Occupancy engine warmed with {len(self.space_zone)} parking spaces")
+
+    def set(self, space_id: str, zone_id: str, status: str):
+        current_zone = self.space_zone.get(space_id)
+        if current_zone is not None and current_zone != zone_id:
+            self.remove(space_id)
+        zone = self.zones.get(zone_id)
+        if zone is None:
+            zone = self.zones[zone_id] = ZoneOccupancy()
+        zone.set(space_id, self._code(status))
+        self.space_zone[space_id] = zone_id
+
+    def remove(self, space_id: str):
+        zone_id = self.space_zone.pop(space_id, None)
+        if zone_id is None:
+            return
+        zone = self.zones[zone_id]
+        zone.remove(space_id)
+        if not zone.space_ids:
+            del self.zones[zone_id]
+
+    def zone_summary(self, zone_id: str, include_spaces: bool = False):
+        zone = self.zones.get(zone_id)
+        counts = {}
+        total = occupied = 0
+        if zone is not None:
+            for code, n in zone.counts.items():
+                if n:
+                    status = self.names[code]
+                    counts[status] = n
+                    total += n
+                    if status in OCCUPIED_STATUSES:
+                        occupied += n
+        summary = {
+            "zone_id": zone_id,
+            "total": total,
+            "occupied": occupied,
+            "available": total - occupied,
+            "occupancy_rate": round(occupied / total, 4) if total else 0.0,
+            "by_status": counts,
+        }
+        if include_spaces:
+            summary["spaces"] = {} if zone is None else {
+                space_id: self.names[code] for space_id, code in zip(zone.space_ids, zone.statuses)
+            }
+        return summary
+
+    def summary(self):
+        zones = [self.zone_summary(zone_id) for zone_id in self.zones]
+        total = sum(z["total"] for z in zones)
+        occupied = sum(z["occupied"] for z in zones)
+        return {
+            "total": total,
+            "occupied": occupied,
+            "available": total - occupied,
+            "occupancy_rate": round(occupied / total, 4) if total else 0.0,
+            "zones": zones,
+        }
+
+
+occupancy_engine = OccupancyEngine()
@@ -0,0 +1,79 @@
+import base64
+import json
+from bson import json_util
+from fastapi import HTTPException
+
+
+def _sort_value(doc: dict, sort_by: str):
+    value = doc
+    for part in sort_by.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def encode_cursor(doc: dict, sort_by: str, order: int) -> str:
+    payload = {"s": sort_by, "o": order, "k": _sort_value(doc, sort_by), "id": doc["_id"]}
+    raw = json_util.dumps(payload, json_options=json_util.CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: int):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        key, last_id = payload["k"], payload["id"]
+        cursor_sort, cursor_order = payload["s"], payload["o"]
+    except (ValueError, KeyError, TypeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort_by or cursor_order != order:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort_by/order")
+    return key, last_id
+
+
+def keyset_query(query: dict, sort_by: str, order: int, key, last_id) -> dict:
+    """Restrict `query` to documents strictly after (key, last_id) in (sort_by, _id) order."""
+    op = "$gt" if order == 1 else "$lt"
+    if sort_by == "_id":
+        after = {"_id": {op: last_id}}
+    elif key is None:
+        # Nulls sort first ascending and last descending.
+        after = {sort_by: None, "_id": {op: last_id}}
+        if order == 1:
+            after = {"$or": [after, {sort_by: {"$ne": None}}]}
+    else:
+        after = {"$or": [{sort_by: {op: key}}, {sort_by: key, "_id": {op: last_id}}]}
+        if order == -1:
+            # $lt never matches null (type bracketing), yet nulls follow every key descending.
+            after["$or"].append({sort_by: None})
+    return {"$and": [query, after]} if query else after
+
+
+def sort_spec(sort_by: str, order: int):
+    if sort_by == "_id":
+        return [("_id", order)]
+    return [(sort_by, order), ("_id", order)]
+
+
+async def fetch_page(collection, query: dict, sort_by: str, order: int, skip: int, limit: int, cursor: str = None,
+                     projection: dict = None):
+    """Return one page of raw documents plus the cursor for the following page.
+
+    With `cursor` set the page is located with a (sort key, _id) range query instead
+    of `skip`, so the cost does not grow with page depth and concurrent inserts do
+    not shift the pages that follow.
+    """
+    if order not in (1, -1):
+        raise HTTPException(status_code=400, detail="order must be 1 or -1")
+    if cursor:
+        key, last_id = decode_cursor(cursor, sort_by, order)
+        find = collection.find(keyset_query(query, sort_by, order, key, last_id), projection)
+        find = find.sort(sort_spec(sort_by, order)).limit(limit)
+    else:
+        find = collection.find(query, projection).sort(sort_spec(sort_by, order)).skip(skip).limit(limit)
+    docs = [doc async for doc in find]
+    next_cursor = None
+    if limit and len(docs) == limit:
+        next_cursor = encode_cursor(docs[-1], sort_by, order)
+    return docs, next_cursor
@@ -0,0 +1,102 @@
+import os
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from app.repository import vehicles_repo
+
+# ANPR misreads between these characters are common, so they are folded together for
+# candidate lookup and cost less than an ordinary substitution when ranking.
+CONFUSABLE = {"O": "0", "Q": "0", "D": "0", "I": "1", "L": "1", "B": "8", "S": "5", "Z": "2", "G": "6"}
+CONFUSION_COST = float(os.getenv("PLATE_CONFUSION_COST", "0.25"))
+SEARCH_CANDIDATES = int(os.getenv("PLATE_SEARCH_CANDIDATES", "200"))
+PLATE_TRIGRAMS = "plate_trigrams"
+BACKFILL_BATCH_SIZE = 1000
+
+
+def normalize(plate: str) -> str:
+    return "".join(ch for ch in plate.upper() if ch.isalnum())
+
+
+def fold(plate: str) -> str:
+    return "".join(CONFUSABLE.get(ch, ch) for ch in plate)
+
+
+def trigrams(key: str) -> list:
+    padded = f"^{key}$"
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def plate_fields(plate: str) -> dict:
+    """Derived fields stored with a vehicle so plate search can use the multikey index."""
+    return {PLATE_TRIGRAMS: trigrams(fold(normalize(plate)))}
+
+
+def substitution_cost(a: str, b: str) -> float:
+    if a == b:
+        return 0.0
+    if CONFUSABLE.get(a, a) == CONFUSABLE.get(b, b):
+        return CONFUSION_COST
+    return 1.0
+
+
+def distance(a: str, b: str) -> float:
+    """Levenshtein distance where confusable substitutions cost CONFUSION_COST."""
+    previous = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        current = [float(i)]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + substitution_cost(ca, cb),
+            ))
+        previous = current
+    return previous[-1]
+
+
+async def search(plate: str, limit: int, max_distance: float):
+    """Return (normalized query, [(distance, vehicle)]) ranked by confusion-aware edit distance.
+
+    Candidates come from the trigram index over folded plates. An edit changes at most
+    three trigrams, so plates within `max_distance` share at least len(grams) - 3k of them.
+    """
+    query = normalize(plate)
+    if not query:
+        raise HTTPException(status_code=400, detail="Plate must contain letters or digits")
+    grams = trigrams(fold(query))
+    min_overlap = max(1, len(grams) - 3 * int(max_distance))
+    pipeline = [
+        {"$match": {"is_deleted": False, PLATE_TRIGRAMS: {"$in": grams}}},
+        {"$addFields": {"_overlap": {"$size": {"$filter": {
+            "input": f"${PLATE_TRIGRAMS}", "cond": {"$in": ["$$this", grams]},
+        }}}}},
+        {"$match": {"_overlap": {"$gte": min_overlap}}},
+        {"$sort": {"_overlap": -1}},
+        {"$limit": SEARCH_CANDIDATES},
+        {"$project": {PLATE_TRIGRAMS: 0}},
+    ]
+    ranked = []
+    async for doc in vehicles_repo.collection.aggregate(pipeline):
+        overlap = doc.pop("_overlap")
+        d = distance(query, normalize(doc.get("license_plate") or ""))
+        if d <= max_distance:
+            doc["_id"] = str(doc["_id"])
+            ranked.append((d, -overlap, doc["license_plate"], doc))
+    ranked.sort(key=lambda r: r[:3])
+    return query, [(round(d, 4), doc) for d, _, _, doc in ranked[:limit]]
+
+
+async def backfill() -> int:
+    """Add plate trigrams to vehicles written before plate search existed."""
+    updated = 0
+    ops = []
+    cursor = vehicles_repo.collection.find({PLATE_TRIGRAMS: {"$exists": False}}, {"license_plate": 1})
+    async for doc in cursor:
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": plate_fields(doc.get("license_plate") or "")}))
+        if len(ops) >= BACKFILL_BATCH_SIZE:
+            await vehicles_repo.bulk_write(ops)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await vehicles_repo.bulk_write(ops)
+        updated += len(ops)
+    return updated
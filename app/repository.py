@@ -0,0 +1,241 @@
+import os
+from typing import Optional
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
+from app.cache import TTLCache
+from app.db import get_database
+from app.indexes import ensure_query_indexed
+from app.pagination import fetch_page
+
+DUPLICATE_KEY = 11000
+# A 2dsphere index could not index the document's geometry (e.g. a self-intersecting ring).
+CANNOT_EXTRACT_GEO_KEYS = 16755
+
+# Totals are cached per (collection, write generation, filter). Generations only see
+# this process's writes, so the TTL bounds staleness from other workers and ingests.
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "2048"))
+# Unfiltered lists on collections without soft delete (users) use collection metadata for
+# the total. Soft-delete collections always count, since metadata includes deleted documents.
+ESTIMATE_UNFILTERED_TOTALS = os.getenv("ESTIMATE_UNFILTERED_TOTALS", "true").lower() == "true"
+
+count_cache = TTLCache(maxsize=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL)
+
+# Every write through the API bumps a per-document `version`; it backs the entity ETags.
+VERSION_FIELD = "version"
+BUMP_VERSION = {VERSION_FIELD: 1}
+
+
+def parse_fields(fields: Optional[str]):
+    """Turn a `fields=a,b,c` query parameter into a Mongo projection (None means all fields)."""
+    if not fields:
+        return None
+    projection = {f.strip(): 1 for f in fields.split(",") if f.strip()}
+    return projection or None
+
+
+def _stringify(doc):
+    if doc is not None and "_id" in doc:
+        doc["_id"] = str(doc["_id"])
+    return doc
+
+
+class Repository:
+    """CRUD access to one collection, shared by the routers."""
+
+    def __init__(self, name: str, label: str, soft_delete: bool = True, hidden=()):
+        self.name = name
+        self.label = label
+        self.soft_delete = soft_delete
+        # Derived fields kept for indexes and upserts, never returned to clients.
+        self.hidden = tuple(hidden)
+        self.generation = 0
+
+    @property
+    def collection(self):
+        return get_database()[self.name]
+
+    def not_found(self):
+        return HTTPException(status_code=404, detail=f"{self.label} not found")
+
+    def conflict(self):
+        # A unique index (e.g. one live vehicle per license plate) rejected the write.
+        return HTTPException(status_code=409, detail=f"{self.label} already exists")
+
+    def rejected(self, code, message: str):
+        """The client error for a write an index refused, or None if it is a server error."""
+        if code == DUPLICATE_KEY:
+            return self.conflict()
+        if code == CANNOT_EXTRACT_GEO_KEYS:
+            return HTTPException(status_code=422, detail=f"{self.label} geometry rejected by MongoDB: {message}")
+        return None
+
+    def touch(self):
+        """Record a write so cached totals for this collection are recomputed."""
+        self.generation += 1
+
+    def projection(self, fields: Optional[str] = None):
+        """`fields=` as a projection, with hidden fields always left out."""
+        projection = parse_fields(fields)
+        for field in self.hidden:
+            if projection is not None:
+                projection.pop(field, None)
+        if projection:
+            return projection
+        return {field: 0 for field in self.hidden} or None
+
+    def _strip(self, doc: dict) -> dict:
+        for field in self.hidden:
+            doc.pop(field, None)
+        return doc
+
+    def public(self, doc: dict) -> dict:
+        """A copy of `doc` without hidden fields, for documents that did not come through `get`/`list`."""
+        return self._strip(dict(doc))
+
+    def id_query(self, doc_id) -> dict:
+        # Documents created through the API have ObjectId keys while older ones
+        # use plain strings, so match either form.
+        if isinstance(doc_id, str) and ObjectId.is_valid(doc_id):
+            query = {"_id": {"$in": [ObjectId(doc_id), doc_id]}}
+        else:
+            query = {"_id": doc_id}
+        if self.soft_delete:
+            query["is_deleted"] = False
+        return query
+
+    async def insert_one(self, doc: dict) -> dict:
+        doc[VERSION_FIELD] = 1
+        try:
+            result = await self.collection.insert_one(doc)
+        except OperationFailure as e:
+            raise self.rejected(e.code, (e.details or {}).get("errmsg", str(e))) or e
+        self.touch()
+        doc["_id"] = str(result.inserted_id)
+        return self._strip(doc)
+
+    async def insert_many(self, docs: list, ordered: bool = True) -> list:
+        for doc in docs:
+            doc[VERSION_FIELD] = 1
+        try:
+            result = await self.collection.insert_many(docs, ordered=ordered)
+        except BulkWriteError as e:
+            self.touch()
+            errors = e.details.get("writeErrors", [])
+            if errors and len({err["code"] for err in errors}) == 1:
+                raise self.rejected(errors[0]["code"], errors[0].get("errmsg", "")) or e
+            raise
+        self.touch()
+        for _id, doc in zip(result.inserted_ids, docs):
+            doc["_id"] = str(_id)
+            self._strip(doc)
+        return docs
+
+    async def get(self, doc_id, fields: Optional[str] = None) -> dict:
+        doc = await self.collection.find_one(self.id_query(doc_id), self.projection(fields))
+        if not doc:
+            raise self.not_found()
+        return _stringify(doc)
+
+    async def get_many(self, doc_ids, fields: Optional[str] = None) -> dict:
+        """Fetch documents by id with a single `$in` query; return {id: doc} for those found."""
+        keys = []
+        for doc_id in doc_ids:
+            keys.append(doc_id)
+            if ObjectId.is_valid(doc_id):
+                keys.append(ObjectId(doc_id))
+        query = {"_id": {"$in": keys}}
+        if self.soft_delete:
+            query["is_deleted"] = False
+        docs = {}
+        async for doc in self.collection.find(query, self.projection(fields)):
+            docs[str(doc["_id"])] = _stringify(doc)
+        return docs
+
+    async def count(self, query: dict) -> int:
+        key = (self.name, self.generation, json_util.dumps(query, sort_keys=True))
+        total = count_cache.get(key)
+        if total is None:
+            if ESTIMATE_UNFILTERED_TOTALS and not self.soft_delete and not query:
+                total = await self.collection.estimated_document_count()
+            else:
+                total = await self.collection.count_documents(query)
+            count_cache.set(key, total)
+        return total
+
+    async def list(self, query: dict, sort_by: str, order: int, skip: int, limit: int,
+                   cursor: Optional[str] = None, fields: Optional[str] = None, include_total: bool = True):
+        """Return (total, docs, next_cursor) for one page of `query`; total is None unless requested."""
+        ensure_query_indexed(self.name, query, sort_by)
+        projection = self.projection(fields)
+        if projection is not None and all(projection.values()):
+            # The cursor for the next page is built from the sort key.
+            projection[sort_by] = 1
+        total = await self.count(query) if include_total else None
+        docs, next_cursor = await fetch_page(self.collection, query, sort_by, order, skip, limit, cursor, projection)
+        return total, [_stringify(doc) for doc in docs], next_cursor
+
+    def _update_data(self, data: dict) -> dict:
+        data.pop("is_deleted", None)
+        data.pop(VERSION_FIELD, None)
+        if not data:
+            raise HTTPException(status_code=400, detail="No fields to update")
+        return data
+
+    async def _find_and_update(self, doc_id, data: dict, return_document):
+        try:
+            return await self.collection.find_one_and_update(
+                self.id_query(doc_id), {"$set": self._update_data(data), "$inc": BUMP_VERSION},
+                projection=self.projection(), return_document=return_document,
+            )
+        except OperationFailure as e:
+            raise self.rejected(e.code, (e.details or {}).get("errmsg", str(e))) or e
+
+    async def update(self, doc_id, data: dict) -> dict:
+        """Apply `$set: data` and return the updated document in a single round trip."""
+        doc = await self._find_and_update(doc_id, data, ReturnDocument.AFTER)
+        if not doc:
+            raise self.not_found()
+        self.touch()
+        return _stringify(doc)
+
+    async def update_with_previous(self, doc_id, data: dict):
+        """Like `update`, but return (before, after) for callers that track changes."""
+        before = await self._find_and_update(doc_id, data, ReturnDocument.BEFORE)
+        if not before:
+            raise self.not_found()
+        self.touch()
+        _stringify(before)
+        return before, {**before, **data, VERSION_FIELD: before.get(VERSION_FIELD, 0) + 1}
+
+    async def delete(self, doc_id) -> dict:
+        """Soft delete and return the document as it was before deletion."""
+        if not self.soft_delete:
+            raise HTTPException(status_code=405, detail=f"{self.label} cannot be deleted")
+        doc = await self.collection.find_one_and_update(
+            self.id_query(doc_id), {"$set": {"is_deleted": True}, "$inc": BUMP_VERSION},
+            projection=self.projection(), return_document=ReturnDocument.BEFORE,
+        )
+        if not doc:
+            raise self.not_found()
+        self.touch()
+        return _stringify(doc)
+
+    async def bulk_write(self, operations: list, ordered: bool = False):
+        if not operations:
+            return None
+        try:
+            return await self.collection.bulk_write(operations, ordered=ordered)
+        finally:
+            # Even a failed batch may have applied some operations.
+            self.touch()
+
+
+users_repo = Repository("users", "User", soft_delete=False)
+zones_repo = Repository("zones", "Zone")
+cameras_repo = Repository("cameras", "Camera")
+parking_spaces_repo = Repository("parking_spaces", "Parking space")
+vehicles_repo = Repository("vehicles", "Vehicle", hidden=("plate_trigrams",))
+violations_repo = Repository("violations", "Violation", hidden=("dedupe_key",))
@@ -0,0 +1,109 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from pymongo import UpdateOne
+from app.db import get_database
+from app.timeutils import naive_utc
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "violation_rollups"
+DIMENSIONS = ("zone_id", "type", "status")
+BUCKET_FORMATS = {
+    "hour": "%Y-%m-%dT%H:00:00",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+
+def rollup_key(doc: dict):
+    """Return the (hour, zone_id, type, status) counter a live violation belongs to."""
+    detected_at = doc.get("detected_at")
+    if doc.get("is_deleted") or not isinstance(detected_at, datetime):
+        return None
+    hour = naive_utc(detected_at).replace(minute=0, second=0, microsecond=0)
+    return (hour,) + tuple(doc.get(d) for d in DIMENSIONS)
+
+
+async def apply(deltas: Counter):
+    ops = [
+        UpdateOne(
+            {"hour": key[0], **dict(zip(DIMENSIONS, key[1:]))},
+            {"$inc": {"count": delta}},
+            upsert=True,
+        )
+        for key, delta in deltas.items()
+        if key is not None and delta
+    ]
+    if not ops:
+        return
+    try:
+        await get_database()[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+    except Exception as e:
+        # The violation write already succeeded; a backfill repairs the counters.
+        logger.error(f"Failed to update violation rollups: {e}")
+
+
+async def record(docs, sign: int = 1):
+    deltas = Counter()
+    for doc in docs:
+        deltas[rollup_key(doc)] += sign
+    await apply(deltas)
+
+
+async def record_change(before: dict, after: dict):
+    old, new = rollup_key(before), rollup_key(after)
+    if old != new:
+        await apply(Counter({old: -1, new: 1}))
+
+
+async def backfill():
+    """Rebuild every rollup from the violations collection with one aggregation."""
+    db = get_database()
+    started = datetime.utcnow()
+    await db[ROLLUP_COLLECTION].delete_many({})
+    pipeline = [
+        {"$match": {"is_deleted": False, "detected_at": {"$type": "date"}}},
+        {"$group": {
+            "_id": {
+                "hour": {"$dateFromParts": {
+                    "year": {"$year": "$detected_at"},
+                    "month": {"$month": "$detected_at"},
+                    "day": {"$dayOfMonth": "$detected_at"},
+                    "hour": {"$hour": "$detected_at"},
+                }},
+                **{d: f"${d}" for d in DIMENSIONS},
+            },
+            "count": {"$sum": 1},
+        }},
+        {"$project": {"_id": 0, "hour": "$_id.hour", **{d: f"$_id.{d}" for d in DIMENSIONS}, "count": 1}},
+        {"$merge": {
+            "into": ROLLUP_COLLECTION,
+            "on": ["hour", *DIMENSIONS],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]
+    await db["violations"].aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+    buckets = await db[ROLLUP_COLLECTION].count_documents({})
+    elapsed = (datetime.utcnow() - started).total_seconds()
+    logger.info(f"Violation rollup backfill wrote {buckets} buckets in {elapsed:.1f}s")
+    return {"buckets": buckets, "seconds": round(elapsed, 3)}
+
+
+async def query(start: datetime, end: datetime, bucket: str, group_by, filters: dict):
+    """Sum rollup counters into `bucket`-sized periods, split by the `group_by` dimensions."""
+    start, end = naive_utc(start), naive_utc(end)
+    match = {"hour": {"$gte": start.replace(minute=0, second=0, microsecond=0), "$lt": end}}
+    match.update({k: v for k, v in filters.items() if v is not None})
+    group_id = {"bucket": {"$dateToString": {"format": BUCKET_FORMATS[bucket], "date": "$hour"}}}
+    group_id.update({d: f"${d}" for d in group_by})
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": group_id, "count": {"$sum": "$count"}}},
+        {"$match": {"count": {"$gt": 0}}},
+        {"$sort": {"_id.bucket": 1}},
+    ]
+    rows = await get_database()[ROLLUP_COLLECTION].aggregate(pipeline).to_list(length=None)
+    buckets = [{**row["_id"], "count": row["count"]} for row in rows]
+    return {"total": sum(b["count"] for b in buckets), "buckets": buckets}
@@ -0,0 +1,76 @@
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, Depends, File, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from app.auth import get_current_user, get_current_admin_user
+from app.blobs import CHUNK_SIZE, blob_ref, blob_store, parse_range
+from app.etags import etag_matches
+
+router = APIRouter()
+
+async def _chunks(upload: UploadFile):
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+def _not_modified(request: Request, etag: str, last_modified) -> bool:
+    if request.headers.get("if-none-match") is not None:
+        return etag_matches(request, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@router.post("/blobs", status_code=201, dependencies=[Depends(get_current_user)])
+async def upload_blob(response: Response, file: UploadFile = File(...)):
+    blob, created = await blob_store.put(_chunks(file), file.content_type)
+    if not created:
+        response.status_code = 200
+    return {
+        "sha256": blob["_id"],
+        "ref": blob_ref(blob["_id"]),
+        "size": blob["size"],
+        "content_type": blob["content_type"],
+        "deduplicated": not created,
+    }
+
+@router.get("/blobs/stats", dependencies=[Depends(get_current_admin_user)])
+async def blob_stats():
+    return blob_store.stats()
+
+@router.get("/blobs/{sha256}", dependencies=[Depends(get_current_user)])
+async def download_blob(sha256: str, request: Request):
+    blob = await blob_store.get(sha256)
+    etag = f'"{blob["_id"]}"'
+    last_modified = blob["created_at"].replace(tzinfo=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        # Content never changes for a given address.
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    size = blob["size"]
+    byte_range = None
+    if request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range(request.headers.get("range"), size)
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        blob_store.read(blob, start, end),
+        status_code=status_code,
+        media_type=blob["content_type"],
+        headers=headers,
+    )
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from app.models.camera import Camera, CameraCreate
-from app.db import get_database
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from app.models.camera import Camera, CameraCreate, CameraUpdate, CameraHeartbeat
+from app.repository import cameras_repo
+from app.events import broker
+from app.serialization import batch, page, present_one, present_many
+from app.dataloader import parse_ids
+from app.etags import conditional_get, etag_matches, list_etag, not_modified, with_etag
+from app.heartbeats import camera_heartbeats
 from datetime import datetime
 from typing import List, Optional
 from app.auth import get_current_user, get_current_admin_user
@@ -9,72 +14,90 @@ router = APIRouter()
 
 @router.post("/cameras", response_model=Camera, dependencies=[Depends(get_current_user)])
 async def create_camera(camera: CameraCreate):
-    db = get_database()
     camera_dict = camera.dict()
     camera_dict["created_at"] = datetime.utcnow()
-    result = await db["cameras"].insert_one(camera_dict)
-    camera_dict["_id"] = str(result.inserted_id)
-    return Camera(**camera_dict)
+    camera_dict = await cameras_repo.insert_one(camera_dict)
+    camera_heartbeats.register(camera_dict)
+    broker.publish_local("camera", "created", camera_dict)
+    return present_one(Camera, camera_dict)
 
 @router.post("/cameras/bulk", response_model=List[Camera], dependencies=[Depends(get_current_admin_user)])
 async def create_cameras_bulk(cameras: List[CameraCreate]):
-    db = get_database()
     camera_dicts = [c.dict() for c in cameras]
     for c in camera_dicts:
         c["created_at"] = datetime.utcnow()
-    result = await db["cameras"].insert_many(camera_dicts)
-    inserted = []
-    for _id, c in zip(result.inserted_ids, camera_dicts):
-        c["_id"] = str(_id)
-        inserted.append(Camera(**c))
-    return inserted
+    camera_dicts = await cameras_repo.insert_many(camera_dicts)
+    for c in camera_dicts:
+        camera_heartbeats.register(c)
+        broker.publish_local("camera", "created", c)
+    return present_many(Camera, camera_dicts)
 
 @router.get("/cameras", dependencies=[Depends(get_current_user)])
 async def list_cameras(
+    request: Request,
+    response: Response,
     zone_id: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     sort_by: str = "created_at",
-    order: int = -1
+    order: int = -1,
+    fields: Optional[str] = None,
+    include_total: bool = True
 ):
-    db = get_database()
+    etag = list_etag(cameras_repo, request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     query = {"is_deleted": False}
     if zone_id:
         query["zone_id"] = zone_id
-    total = await db["cameras"].count_documents(query)
-    cameras = []
-    cursor = db["cameras"].find(query).sort(sort_by, order).skip(skip).limit(limit)
-    async for c in cursor:
-        c["_id"] = str(c["_id"])
-        cameras.append(Camera(**c))
-    return {"items": cameras, "total": total}
+    total, docs, next_cursor = await cameras_repo.list(query, sort_by, order, skip, limit, cursor, fields, include_total)
+    return with_etag(page(Camera, docs, total, next_cursor, fields), response, etag)
+
+@router.get("/cameras/health", dependencies=[Depends(get_current_user)])
+async def get_cameras_health(zone_id: Optional[str] = None, status: Optional[str] = None):
+    if not camera_heartbeats.ready:
+        raise HTTPException(status_code=503, detail="Camera health is not loaded yet")
+    return camera_heartbeats.health(zone_id, status)
+
+@router.get("/cameras/health/stats", dependencies=[Depends(get_current_admin_user)])
+async def get_heartbeat_stats():
+    return camera_heartbeats.stats()
+
+@router.get("/cameras/batch", dependencies=[Depends(get_current_user)])
+async def get_cameras_batch(ids: str, fields: Optional[str] = None):
+    ids = parse_ids(ids)
+    return batch(Camera, ids, await cameras_repo.get_many(ids, fields), fields)
 
 @router.get("/cameras/{camera_id}", response_model=Camera, dependencies=[Depends(get_current_user)])
-async def get_camera(camera_id: str):
-    db = get_database()
-    cam = await db["cameras"].find_one({"_id": camera_id, "is_deleted": False})
-    if not cam:
-        raise HTTPException(status_code=404, detail="Camera not found")
-    cam["_id"] = str(cam["_id"])
-    return Camera(**cam)
+async def get_camera(camera_id: str, request: Request, response: Response, fields: Optional[str] = None):
+    cam, etag = await conditional_get(cameras_repo, camera_id, fields, request)
+    if cam is None:
+        return not_modified(etag)
+    return with_etag(present_one(Camera, cam, fields), response, etag)
 
 @router.put("/cameras/{camera_id}", response_model=Camera, dependencies=[Depends(get_current_user)])
 async def update_camera(camera_id: str, camera: CameraCreate):
-    db = get_database()
-    update_data = camera.dict()
-    if "is_deleted" in update_data:
-        del update_data["is_deleted"]
-    result = await db["cameras"].update_one({"_id": camera_id, "is_deleted": False}, {"$set": update_data})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Camera not found")
-    cam = await db["cameras"].find_one({"_id": camera_id})
-    cam["_id"] = str(cam["_id"])
-    return Camera(**cam)
+    cam = await cameras_repo.update(camera_id, camera.dict())
+    camera_heartbeats.register(cam)
+    broker.publish_local("camera", "updated", cam)
+    return present_one(Camera, cam)
+
+@router.patch("/cameras/{camera_id}", response_model=Camera, dependencies=[Depends(get_current_user)])
+async def patch_camera(camera_id: str, camera: CameraUpdate):
+    cam = await cameras_repo.update(camera_id, camera.dict(exclude_unset=True))
+    camera_heartbeats.register(cam)
+    broker.publish_local("camera", "updated", cam)
+    return present_one(Camera, cam)
+
+@router.post("/cameras/{camera_id}/heartbeat", status_code=202, dependencies=[Depends(get_current_user)])
+async def camera_heartbeat(camera_id: str, heartbeat: CameraHeartbeat):
+    await camera_heartbeats.beat(camera_id, heartbeat.status, heartbeat.health, heartbeat.reported_at)
+    return {"detail": "Heartbeat recorded"}
 
 @router.delete("/cameras/{camera_id}", dependencies=[Depends(get_current_admin_user)])
 async def delete_camera(camera_id: str):
-    db = get_database()
-    result = await db["cameras"].update_one({"_id": camera_id, "is_deleted": False}, {"$set": {"is_deleted": True}})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Camera not found")
-    return {"detail": "Camera soft deleted"} 
\ No newline at end of file
+    cam = await cameras_repo.delete(camera_id)
+    camera_heartbeats.remove(cam["_id"])
+    broker.publish_local("camera", "deleted", cam)
+    return {"detail": "Camera soft deleted"}
\ No newline at end of file
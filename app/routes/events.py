@@ -0,0 +1,51 @@
+import asyncio
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.auth import (
+    STREAM_TOKEN_EXPIRE_SECONDS, create_stream_token, get_current_admin_user, get_current_stream_user, get_current_user,
+)
+from app.events import broker
+from app.serialization import dumps
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+def _split(value: Optional[str]):
+    return {v.strip() for v in value.split(",") if v.strip()} if value else None
+
+async def _stream(request: Request, subscription):
+    try:
+        yield b"retry: 3000\n\n"
+        while not await request.is_disconnected():
+            event = await subscription.get(HEARTBEAT_SECONDS)
+            if event is None:
+                yield b": ping\n\n"
+                continue
+            yield b"event: " + event["entity"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+    except asyncio.CancelledError:
+        pass
+    finally:
+        broker.unsubscribe(subscription)
+
+@router.get("/events", dependencies=[Depends(get_current_stream_user)])
+async def events(request: Request, entities: Optional[str] = None, zone_id: Optional[str] = None):
+    subscription = broker.subscribe(_split(entities), _split(zone_id))
+    return StreamingResponse(
+        _stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/events/token")
+async def stream_token(user=Depends(get_current_user)):
+    return {
+        "access_token": create_stream_token(user["_id"]),
+        "token_type": "stream",
+        "expires_in": STREAM_TOKEN_EXPIRE_SECONDS,
+    }
+
+@router.get("/events/stats", dependencies=[Depends(get_current_admin_user)])
+async def event_stats():
+    return broker.stats()
\ No newline at end of file
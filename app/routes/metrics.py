@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.admission import admission
+from app.auth import principal_cache
+from app.blobs import blob_store
+from app.detections import detection_buffer
+from app.etags import entity_cache
+from app.events import broker
+from app.heartbeats import camera_heartbeats
+from app.history import history_recorder
+from app.metrics import registry
+from app.passwords import password_hasher
+from app.repository import count_cache
+from app.sweeper import overstay_sweeper
+
+router = APIRouter()
+
+registry.register_stats("principal_cache", principal_cache.stats)
+registry.register_stats("count_cache", count_cache.stats)
+registry.register_stats("entity_cache", entity_cache.stats)
+registry.register_stats("password_hasher", password_hasher.stats)
+registry.register_stats("detection_buffer", detection_buffer.stats)
+registry.register_stats("camera_heartbeats", camera_heartbeats.stats)
+registry.register_stats("occupancy_history", history_recorder.stats)
+registry.register_stats("events", broker.stats)
+registry.register_stats("overstay_sweeper", lambda: overstay_sweeper.last_stats)
+registry.register_stats("blobs", blob_store.stats)
+registry.register_stats("admission", admission.stats)
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
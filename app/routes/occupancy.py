@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from app.occupancy import occupancy_engine
+from app import history
+from datetime import datetime, timedelta
+from typing import Optional
+from app.auth import get_current_user
+
+router = APIRouter()
+
+def require_ready():
+    if not occupancy_engine.ready:
+        raise HTTPException(status_code=503, detail="Occupancy state is not loaded yet")
+
+@router.get("/occupancy", dependencies=[Depends(get_current_user), Depends(require_ready)])
+async def get_occupancy():
+    return occupancy_engine.summary()
+
+@router.get("/zones/{zone_id}/occupancy", dependencies=[Depends(get_current_user), Depends(require_ready)])
+async def get_zone_occupancy(zone_id: str, include_spaces: bool = False):
+    return occupancy_engine.zone_summary(zone_id, include_spaces)
+
+@router.get("/zones/{zone_id}/occupancy/history", dependencies=[Depends(get_current_user)])
+async def get_zone_occupancy_history(
+    zone_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: Optional[str] = None
+):
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=1)
+    return await history.query(zone_id, start, end, resolution)
@@ -1,41 +1,70 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from app.models.parking_space import ParkingSpace, ParkingSpaceCreate
-from app.db import get_database
+from fastapi import APIRouter, Depends, Query, Request, Response
+from app.models.parking_space import ParkingSpace, ParkingSpaceCreate, ParkingSpaceUpdate
+from app.repository import parking_spaces_repo, vehicles_repo, zones_repo
+from app.events import broker
+from app.serialization import batch, page, present_one, present_many
+from app.dataloader import DataLoader, parse_expand, parse_ids, with_reference_fields
+from app.etags import conditional_get, etag_matches, list_etag, not_modified, with_etag
+from app.ingest import ingest_ndjson
+from app.occupancy import occupancy_engine
+from app.history import history_recorder
 from typing import List, Optional
 from app.auth import get_current_user, get_current_admin_user
 
 router = APIRouter()
 
+# Relations `expand=` can resolve: name -> (repository, reference field).
+PARKING_SPACE_RELATIONS = {
+    "zone": (zones_repo, "zone_id"),
+    "vehicle": (vehicles_repo, "occupied_by_car_id"),
+}
+
+async def track_inserted_spaces(docs):
+    for s in docs:
+        occupancy_engine.set(str(s["_id"]), s["zone_id"], s["status"])
+        broker.publish_local("parking_space", "created", s)
+    await history_recorder.record((None, s) for s in docs)
+
 @router.post("/parking-spaces", response_model=ParkingSpace, dependencies=[Depends(get_current_user)])
 async def create_parking_space(space: ParkingSpaceCreate):
-    db = get_database()
-    space_dict = space.dict()
-    result = await db["parking_spaces"].insert_one(space_dict)
-    space_dict["_id"] = str(result.inserted_id)
-    return ParkingSpace(**space_dict)
+    space_dict = await parking_spaces_repo.insert_one(space.dict())
+    occupancy_engine.set(space_dict["_id"], space_dict["zone_id"], space_dict["status"])
+    await history_recorder.record([(None, space_dict)])
+    broker.publish_local("parking_space", "created", space_dict)
+    return present_one(ParkingSpace, space_dict)
 
 @router.post("/parking-spaces/bulk", response_model=List[ParkingSpace], dependencies=[Depends(get_current_admin_user)])
 async def create_parking_spaces_bulk(spaces: List[ParkingSpaceCreate]):
-    db = get_database()
-    space_dicts = [s.dict() for s in spaces]
-    result = await db["parking_spaces"].insert_many(space_dicts)
-    inserted = []
-    for _id, s in zip(result.inserted_ids, space_dicts):
-        s["_id"] = str(_id)
-        inserted.append(ParkingSpace(**s))
-    return inserted
+    space_dicts = await parking_spaces_repo.insert_many([s.dict() for s in spaces])
+    await track_inserted_spaces(space_dicts)
+    return present_many(ParkingSpace, space_dicts)
+
+@router.post("/parking-spaces/ingest", dependencies=[Depends(get_current_admin_user)])
+async def ingest_parking_spaces(request: Request, batch_size: int = Query(500, ge=1, le=5000)):
+    summary = await ingest_ndjson(request.stream(), parking_spaces_repo.collection, ParkingSpaceCreate, batch_size, on_insert=track_inserted_spaces)
+    parking_spaces_repo.touch()
+    return summary
 
 @router.get("/parking-spaces", dependencies=[Depends(get_current_user)])
 async def list_parking_spaces(
+    request: Request,
+    response: Response,
     zone_id: Optional[str] = None,
     type: Optional[str] = None,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     sort_by: str = "zone_id",
-    order: int = -1
+    order: int = -1,
+    fields: Optional[str] = None,
+    include_total: bool = True,
+    expand: Optional[str] = None
 ):
-    db = get_database()
+    relations = parse_expand(expand, PARKING_SPACE_RELATIONS)
+    etag = list_etag(parking_spaces_repo, request, [repo for repo, _ in relations.values()])
+    if etag_matches(request, etag):
+        return not_modified(etag)
     query = {"is_deleted": False}
     if zone_id:
         query["zone_id"] = zone_id
@@ -43,40 +72,44 @@ async def list_parking_spaces(
         query["type"] = type
     if status:
         query["status"] = status
-    total = await db["parking_spaces"].count_documents(query)
-    spaces = []
-    cursor = db["parking_spaces"].find(query).sort(sort_by, order).skip(skip).limit(limit)
-    async for s in cursor:
-        s["_id"] = str(s["_id"])
-        spaces.append(ParkingSpace(**s))
-    return {"items": spaces, "total": total}
+    total, docs, next_cursor = await parking_spaces_repo.list(
+        query, sort_by, order, skip, limit, cursor, with_reference_fields(fields, relations), include_total
+    )
+    await DataLoader().expand(docs, relations)
+    return with_etag(page(ParkingSpace, docs, total, next_cursor, fields, raw=bool(relations)), response, etag)
+
+@router.get("/parking-spaces/batch", dependencies=[Depends(get_current_user)])
+async def get_parking_spaces_batch(ids: str, fields: Optional[str] = None):
+    ids = parse_ids(ids)
+    return batch(ParkingSpace, ids, await parking_spaces_repo.get_many(ids, fields), fields)
 
 @router.get("/parking-spaces/{space_id}", response_model=ParkingSpace, dependencies=[Depends(get_current_user)])
-async def get_parking_space(space_id: str):
-    db = get_database()
-    s = await db["parking_spaces"].find_one({"_id": space_id, "is_deleted": False})
-    if not s:
-        raise HTTPException(status_code=404, detail="Parking space not found")
-    s["_id"] = str(s["_id"])
-    return ParkingSpace(**s)
+async def get_parking_space(space_id: str, request: Request, response: Response, fields: Optional[str] = None):
+    s, etag = await conditional_get(parking_spaces_repo, space_id, fields, request)
+    if s is None:
+        return not_modified(etag)
+    return with_etag(present_one(ParkingSpace, s, fields), response, etag)
 
 @router.put("/parking-spaces/{space_id}", response_model=ParkingSpace, dependencies=[Depends(get_current_user)])
 async def update_parking_space(space_id: str, space: ParkingSpaceCreate):
-    db = get_database()
-    update_data = space.dict()
-    if "is_deleted" in update_data:
-        del update_data["is_deleted"]
-    result = await db["parking_spaces"].update_one({"_id": space_id, "is_deleted": False}, {"$set": update_data})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Parking space not found")
-    s = await db["parking_spaces"].find_one({"_id": space_id})
-    s["_id"] = str(s["_id"])
-    return ParkingSpace(**s)
+    before, s = await parking_spaces_repo.update_with_previous(space_id, space.dict())
+    occupancy_engine.set(s["_id"], s["zone_id"], s["status"])
+    await history_recorder.record([(before, s)])
+    broker.publish_local("parking_space", "updated", s)
+    return present_one(ParkingSpace, s)
+
+@router.patch("/parking-spaces/{space_id}", response_model=ParkingSpace, dependencies=[Depends(get_current_user)])
+async def patch_parking_space(space_id: str, space: ParkingSpaceUpdate):
+    before, s = await parking_spaces_repo.update_with_previous(space_id, space.dict(exclude_unset=True))
+    occupancy_engine.set(s["_id"], s["zone_id"], s["status"])
+    await history_recorder.record([(before, s)])
+    broker.publish_local("parking_space", "updated", s)
+    return present_one(ParkingSpace, s)
 
 @router.delete("/parking-spaces/{space_id}", dependencies=[Depends(get_current_admin_user)])
 async def delete_parking_space(space_id: str):
-    db = get_database()
-    result = await db["parking_spaces"].update_one({"_id": space_id, "is_deleted": False}, {"$set": {"is_deleted": True}})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Parking space not found")
-    return {"detail": "Parking space soft deleted"} 
\ No newline at end of file
+    s = await parking_spaces_repo.delete(space_id)
+    occupancy_engine.remove(space_id)
+    await history_recorder.record([(s, None)])
+    broker.publish_local("parking_space", "deleted", s)
+    return {"detail": "Parking space soft deleted"}
\ No newline at end of file
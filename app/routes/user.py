@@ -1,13 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from app.models.user import UserCreate, User, UserInDB, UserUpdate
-from app.db import get_database
-from passlib.context import CryptContext
+from app.repository import users_repo
+from app.passwords import password_hasher
 from jose import jwt
 from datetime import datetime, timedelta
 import os
 from typing import Optional, List
-from app.auth import get_current_admin_user
-from bson import ObjectId
+from app.auth import get_current_admin_user, invalidate_principal, principal_cache
 from fastapi import Body
 
 router = APIRouter()
@@ -15,13 +14,12 @@ router = APIRouter()
 SECRET_KEY = os.getenv("SECRET_KEY", "secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -31,11 +29,10 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 @router.post("/register", response_model=User)
 async def register(user: UserCreate):
-    db = get_database()
-    existing = await db["users"].find_one({"email": user.email})
+    existing = await users_repo.collection.find_one({"email": user.email})
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_doc = {
         "email": user.email,
         "hashed_password": hashed_password,
@@ -45,15 +42,13 @@ async def register(user: UserCreate):
         "created_at": datetime.utcnow(),
         "updated_at": None
     }
-    result = await db["users"].insert_one(user_doc)
-    user_doc["_id"] = str(result.inserted_id)
+    user_doc = await users_repo.insert_one(user_doc)
     return User(**user_doc)
 
 @router.post("/login")
 async def login(user: UserCreate):
-    db = get_database()
-    user_doc = await db["users"].find_one({"email": user.email})
-    if not user_doc or not verify_password(user.password, user_doc["hashed_password"]):
+    user_doc = await users_repo.collection.find_one({"email": user.email})
+    if not user_doc or not await verify_password(user.password, user_doc["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     access_token = create_access_token({
         "sub": str(user_doc["_id"]),
@@ -66,28 +61,24 @@ async def login(user: UserCreate):
 async def list_users(
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     email: Optional[str] = None,
     sort_by: str = "created_at",
-    order: int = -1
+    order: int = -1,
+    include_total: bool = True
 ):
-    db = get_database()
     query = {}
     if email:
         query["email"] = email
-    total = await db["users"].count_documents(query)
-    users = []
-    cursor = db["users"].find(query).sort(sort_by, order).skip(skip).limit(limit)
-    async for u in cursor:
-        u["_id"] = str(u["_id"])
-        users.append(User(**u))
-    return {"items": users, "total": total}
+    total, docs, next_cursor = await users_repo.list(query, sort_by, order, skip, limit, cursor, include_total=include_total)
+    users = [User(**u) for u in docs]
+    return {"items": users, "total": total, "next_cursor": next_cursor}
 
 @router.patch("/users/{user_id}", dependencies=[Depends(get_current_admin_user)])
 async def update_user(
     user_id: str,
     user_update: UserUpdate = Body(..., title="User Update Data")
 ):
-    db = get_database()
     update = {"updated_at": datetime.utcnow()}
     if user_update.roles is not None:
         update["roles"] = user_update.roles
@@ -95,9 +86,10 @@ async def update_user(
         update["is_active"] = user_update.is_active
     if user_update.mfa_enabled is not None:
         update["mfa_enabled"] = user_update.mfa_enabled
-    result = await db["users"].update_one({"_id": ObjectId(user_id)}, {"$set": update})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
-    user = await db["users"].find_one({"_id": ObjectId(user_id)})
-    user["_id"] = str(user["_id"])
-    return User(**user) 
\ No newline at end of file
+    user = await users_repo.update(user_id, update)
+    invalidate_principal(user_id)
+    return User(**user)
+
+@router.get("/cache/principals", dependencies=[Depends(get_current_admin_user)])
+async def principal_cache_stats():
+    return principal_cache.stats()
\ No newline at end of file
@@ -1,42 +1,88 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from app.models.vehicle import Vehicle, VehicleCreate
-from app.db import get_database
+from fastapi import APIRouter, Depends, Query, Request, Response
+from app.models.vehicle import Vehicle, VehicleCreate, VehicleUpdate, VehicleDetection
+from app.repository import vehicles_repo
+from app.serialization import batch, page, present_one, present_many
+from app.dataloader import parse_ids
+from app.etags import conditional_get, etag_matches, list_etag, not_modified, with_etag
+from app.ingest import ingest_ndjson
+from app.detections import detection_buffer
+from app.blobs import blob_store
+from app import plates
+from app.export import export
+from datetime import datetime
 from typing import List, Optional
 from app.auth import get_current_user, get_current_admin_user
 
 router = APIRouter()
 
+EXPORT_COLUMNS = [f for f in VehicleCreate.model_fields if f != "is_deleted"]
+
 @router.post("/vehicles", response_model=Vehicle, dependencies=[Depends(get_current_user)])
 async def create_vehicle(vehicle: VehicleCreate):
-    db = get_database()
     vehicle_dict = vehicle.dict()
-    result = await db["vehicles"].insert_one(vehicle_dict)
-    vehicle_dict["_id"] = str(result.inserted_id)
-    return Vehicle(**vehicle_dict)
+    vehicle_dict.update(plates.plate_fields(vehicle_dict["license_plate"]))
+    await blob_store.externalize_field(vehicle_dict, "snapshots")
+    vehicle_dict = await vehicles_repo.insert_one(vehicle_dict)
+    return present_one(Vehicle, vehicle_dict)
 
 @router.post("/vehicles/bulk", response_model=List[Vehicle], dependencies=[Depends(get_current_admin_user)])
 async def create_vehicles_bulk(vehicles: List[VehicleCreate]):
-    db = get_database()
     vehicle_dicts = [v.dict() for v in vehicles]
-    result = await db["vehicles"].insert_many(vehicle_dicts)
-    inserted = []
-    for _id, v in zip(result.inserted_ids, vehicle_dicts):
-        v["_id"] = str(_id)
-        inserted.append(Vehicle(**v))
-    return inserted
+    for v in vehicle_dicts:
+        v.update(plates.plate_fields(v["license_plate"]))
+        await blob_store.externalize_field(v, "snapshots")
+    vehicle_dicts = await vehicles_repo.insert_many(vehicle_dicts)
+    return present_many(Vehicle, vehicle_dicts)
+
+@router.post("/vehicles/detections", status_code=202, dependencies=[Depends(get_current_user)])
+async def record_detection(detection: VehicleDetection):
+    detection.snapshots = await blob_store.externalize(detection.snapshots)
+    await detection_buffer.add(detection)
+    return {"detail": "Detection queued", "pending": len(detection_buffer.pending)}
+
+@router.post("/vehicles/detections/bulk", status_code=202, dependencies=[Depends(get_current_user)])
+async def record_detections_bulk(detections: List[VehicleDetection]):
+    for detection in detections:
+        detection.snapshots = await blob_store.externalize(detection.snapshots)
+        await detection_buffer.add(detection)
+    return {"detail": f"{len(detections)} detections queued", "pending": len(detection_buffer.pending)}
+
+@router.get("/vehicles/detections/stats", dependencies=[Depends(get_current_admin_user)])
+async def detection_stats():
+    return detection_buffer.stats()
+
+async def prepare_ingested_vehicle(doc):
+    doc.update(plates.plate_fields(doc["license_plate"]))
+    await blob_store.externalize_field(doc, "snapshots")
+
+@router.post("/vehicles/ingest", dependencies=[Depends(get_current_admin_user)])
+async def ingest_vehicles(request: Request, batch_size: int = Query(500, ge=1, le=5000)):
+    summary = await ingest_ndjson(
+        request.stream(), vehicles_repo.collection, VehicleCreate, batch_size,
+        prepare=prepare_ingested_vehicle,
+    )
+    vehicles_repo.touch()
+    return summary
 
 @router.get("/vehicles", dependencies=[Depends(get_current_user)])
 async def list_vehicles(
+    request: Request,
+    response: Response,
     license_plate: Optional[str] = None,
     make: Optional[str] = None,
     model: Optional[str] = None,
     color: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     sort_by: str = "first_detected_at",
-    order: int = -1
+    order: int = -1,
+    fields: Optional[str] = None,
+    include_total: bool = True
 ):
-    db = get_database()
+    etag = list_etag(vehicles_repo, request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     query = {"is_deleted": False}
     if license_plate:
         query["license_plate"] = license_plate
@@ -46,40 +92,62 @@ async def list_vehicles(
         query["model"] = model
     if color:
         query["color"] = color
-    total = await db["vehicles"].count_documents(query)
-    vehicles = []
-    cursor = db["vehicles"].find(query).sort(sort_by, order).skip(skip).limit(limit)
-    async for v in cursor:
-        v["_id"] = str(v["_id"])
-        vehicles.append(Vehicle(**v))
-    return {"items": vehicles, "total": total}
+    total, docs, next_cursor = await vehicles_repo.list(query, sort_by, order, skip, limit, cursor, fields, include_total)
+    return with_etag(page(Vehicle, docs, total, next_cursor, fields), response, etag)
+
+@router.get("/vehicles/export", dependencies=[Depends(get_current_admin_user)])
+async def export_vehicles(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    fields: Optional[str] = None,
+    gzip: bool = False
+):
+    return export(vehicles_repo, "first_detected_at", EXPORT_COLUMNS, start, end, format, fields, gzip)
+
+@router.get("/vehicles/search", dependencies=[Depends(get_current_user)])
+async def search_plates(
+    plate: str = Query(..., min_length=1, max_length=20),
+    limit: int = Query(10, ge=1, le=50),
+    max_distance: float = Query(2, ge=0, le=4)
+):
+    query, matches = await plates.search(plate, limit, max_distance)
+    return {"plate": query, "items": [{"distance": d, "vehicle": Vehicle(**doc)} for d, doc in matches]}
+
+@router.post("/vehicles/search/backfill", dependencies=[Depends(get_current_admin_user)])
+async def backfill_plate_index():
+    return {"updated": await plates.backfill()}
+
+@router.get("/vehicles/batch", dependencies=[Depends(get_current_user)])
+async def get_vehicles_batch(ids: str, fields: Optional[str] = None):
+    ids = parse_ids(ids)
+    return batch(Vehicle, ids, await vehicles_repo.get_many(ids, fields), fields)
 
 @router.get("/vehicles/{vehicle_id}", response_model=Vehicle, dependencies=[Depends(get_current_user)])
-async def get_vehicle(vehicle_id: str):
-    db = get_database()
-    v = await db["vehicles"].find_one({"_id": vehicle_id, "is_deleted": False})
-    if not v:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    v["_id"] = str(v["_id"])
-    return Vehicle(**v)
+async def get_vehicle(vehicle_id: str, request: Request, response: Response, fields: Optional[str] = None):
+    v, etag = await conditional_get(vehicles_repo, vehicle_id, fields, request)
+    if v is None:
+        return not_modified(etag)
+    return with_etag(present_one(Vehicle, v, fields), response, etag)
 
 @router.put("/vehicles/{vehicle_id}", response_model=Vehicle, dependencies=[Depends(get_current_user)])
 async def update_vehicle(vehicle_id: str, vehicle: VehicleCreate):
-    db = get_database()
-    update_data = vehicle.dict()
-    if "is_deleted" in update_data:
-        del update_data["is_deleted"]
-    result = await db["vehicles"].update_one({"_id": vehicle_id, "is_deleted": False}, {"$set": update_data})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    v = await db["vehicles"].find_one({"_id": vehicle_id})
-    v["_id"] = str(v["_id"])
-    return Vehicle(**v)
+    data = vehicle.dict()
+    data.update(plates.plate_fields(data["license_plate"]))
+    await blob_store.externalize_field(data, "snapshots")
+    v = await vehicles_repo.update(vehicle_id, data)
+    return present_one(Vehicle, v)
+
+@router.patch("/vehicles/{vehicle_id}", response_model=Vehicle, dependencies=[Depends(get_current_user)])
+async def patch_vehicle(vehicle_id: str, vehicle: VehicleUpdate):
+    data = vehicle.dict(exclude_unset=True)
+    if data.get("license_plate"):
+        data.update(plates.plate_fields(data["license_plate"]))
+    await blob_store.externalize_field(data, "snapshots")
+    v = await vehicles_repo.update(vehicle_id, data)
+    return present_one(Vehicle, v)
 
 @router.delete("/vehicles/{vehicle_id}", dependencies=[Depends(get_current_admin_user)])
 async def delete_vehicle(vehicle_id: str):
-    db = get_database()
-    result = await db["vehicles"].update_one({"_id": vehicle_id, "is_deleted": False}, {"$set": {"is_deleted": True}})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    return {"detail": "Vehicle soft deleted"} 
\ No newline at end of file
+    await vehicles_repo.delete(vehicle_id)
+    return {"detail": "Vehicle soft deleted"}
\ No newline at end of file
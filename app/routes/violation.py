@@ -1,32 +1,64 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from app.models.violation import Violation, ViolationCreate
-from app.db import get_database
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from app.models.violation import Violation, ViolationCreate, ViolationUpdate
+from app.repository import parking_spaces_repo, vehicles_repo, violations_repo, zones_repo
+from app.events import broker
+from app.serialization import batch, page, present_one, present_many
+from app.dataloader import DataLoader, parse_expand, parse_ids, with_reference_fields
+from app.etags import conditional_get, etag_matches, list_etag, not_modified, with_etag
+from app.ingest import ingest_ndjson
+from app.blobs import blob_store
+from app import rollups
+from app.sweeper import overstay_sweeper
+from app.export import export
+from datetime import datetime, timedelta
 from typing import List, Optional
 from app.auth import get_current_user, get_current_admin_user
 
 router = APIRouter()
 
+# Relations `expand=` can resolve: name -> (repository, reference field).
+VIOLATION_RELATIONS = {
+    "vehicle": (vehicles_repo, "car_id"),
+    "parking_space": (parking_spaces_repo, "parking_space_id"),
+    "zone": (zones_repo, "zone_id"),
+}
+EXPORT_COLUMNS = [f for f in ViolationCreate.model_fields if f != "is_deleted"]
+
+async def track_inserted_violations(docs):
+    await rollups.record(docs)
+    for v in docs:
+        broker.publish_local("violation", "created", v)
+
 @router.post("/violations", response_model=Violation, dependencies=[Depends(get_current_user)])
 async def create_violation(violation: ViolationCreate):
-    db = get_database()
     violation_dict = violation.dict()
-    result = await db["violations"].insert_one(violation_dict)
-    violation_dict["_id"] = str(result.inserted_id)
-    return Violation(**violation_dict)
+    await blob_store.externalize_field(violation_dict, "evidence")
+    violation_dict = await violations_repo.insert_one(violation_dict)
+    await track_inserted_violations([violation_dict])
+    return present_one(Violation, violation_dict)
 
 @router.post("/violations/bulk", response_model=List[Violation], dependencies=[Depends(get_current_admin_user)])
 async def create_violations_bulk(violations: List[ViolationCreate]):
-    db = get_database()
     violation_dicts = [v.dict() for v in violations]
-    result = await db["violations"].insert_many(violation_dicts)
-    inserted = []
-    for _id, v in zip(result.inserted_ids, violation_dicts):
-        v["_id"] = str(_id)
-        inserted.append(Violation(**v))
-    return inserted
+    for v in violation_dicts:
+        await blob_store.externalize_field(v, "evidence")
+    violation_dicts = await violations_repo.insert_many(violation_dicts)
+    await track_inserted_violations(violation_dicts)
+    return present_many(Violation, violation_dicts)
+
+@router.post("/violations/ingest", dependencies=[Depends(get_current_admin_user)])
+async def ingest_violations(request: Request, batch_size: int = Query(500, ge=1, le=5000)):
+    summary = await ingest_ndjson(
+        request.stream(), violations_repo.collection, ViolationCreate, batch_size,
+        on_insert=track_inserted_violations, prepare=lambda doc: blob_store.externalize_field(doc, "evidence"),
+    )
+    violations_repo.touch()
+    return summary
 
 @router.get("/violations", dependencies=[Depends(get_current_user)])
 async def list_violations(
+    request: Request,
+    response: Response,
     car_id: Optional[str] = None,
     parking_space_id: Optional[str] = None,
     zone_id: Optional[str] = None,
@@ -34,10 +66,17 @@ async def list_violations(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     sort_by: str = "detected_at",
-    order: int = -1
+    order: int = -1,
+    fields: Optional[str] = None,
+    include_total: bool = True,
+    expand: Optional[str] = None
 ):
-    db = get_database()
+    relations = parse_expand(expand, VIOLATION_RELATIONS)
+    etag = list_etag(violations_repo, request, [repo for repo, _ in relations.values()])
+    if etag_matches(request, etag):
+        return not_modified(etag)
     query = {"is_deleted": False}
     if car_id:
         query["car_id"] = car_id
@@ -49,40 +88,87 @@ async def list_violations(
         query["type"] = type
     if status:
         query["status"] = status
-    total = await db["violations"].count_documents(query)
-    violations = []
-    cursor = db["violations"].find(query).sort(sort_by, order).skip(skip).limit(limit)
-    async for v in cursor:
-        v["_id"] = str(v["_id"])
-        violations.append(Violation(**v))
-    return {"items": violations, "total": total}
+    total, docs, next_cursor = await violations_repo.list(
+        query, sort_by, order, skip, limit, cursor, with_reference_fields(fields, relations), include_total
+    )
+    await DataLoader().expand(docs, relations)
+    return with_etag(page(Violation, docs, total, next_cursor, fields, raw=bool(relations)), response, etag)
+
+@router.get("/violations/export", dependencies=[Depends(get_current_admin_user)])
+async def export_violations(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    fields: Optional[str] = None,
+    gzip: bool = False
+):
+    return export(violations_repo, "detected_at", EXPORT_COLUMNS, start, end, format, fields, gzip)
+
+@router.get("/violations/stats", dependencies=[Depends(get_current_user)])
+async def violation_stats(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: str = "hour",
+    group_by: Optional[str] = None,
+    zone_id: Optional[str] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None
+):
+    if bucket not in rollups.BUCKET_FORMATS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {list(rollups.BUCKET_FORMATS)}")
+    dimensions = [d.strip() for d in group_by.split(",") if d.strip()] if group_by else []
+    if any(d not in rollups.DIMENSIONS for d in dimensions):
+        raise HTTPException(status_code=400, detail=f"group_by must be a subset of {list(rollups.DIMENSIONS)}")
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=1)
+    result = await rollups.query(start, end, bucket, dimensions, {"zone_id": zone_id, "type": type, "status": status})
+    return {"from": start, "to": end, "bucket": bucket, "group_by": dimensions, **result}
+
+@router.post("/violations/stats/backfill", dependencies=[Depends(get_current_admin_user)])
+async def backfill_violation_stats():
+    return await rollups.backfill()
+
+@router.get("/violations/sweeper", dependencies=[Depends(get_current_admin_user)])
+async def overstay_sweeper_stats():
+    return overstay_sweeper.stats()
+
+@router.post("/violations/sweeper/run", dependencies=[Depends(get_current_admin_user)])
+async def run_overstay_sweeper():
+    return await overstay_sweeper.sweep()
+
+@router.get("/violations/batch", dependencies=[Depends(get_current_user)])
+async def get_violations_batch(ids: str, fields: Optional[str] = None):
+    ids = parse_ids(ids)
+    return batch(Violation, ids, await violations_repo.get_many(ids, fields), fields)
 
 @router.get("/violations/{violation_id}", response_model=Violation, dependencies=[Depends(get_current_user)])
-async def get_violation(violation_id: str):
-    db = get_database()
-    v = await db["violations"].find_one({"_id": violation_id, "is_deleted": False})
-    if not v:
-        raise HTTPException(status_code=404, detail="Violation not found")
-    v["_id"] = str(v["_id"])
-    return Violation(**v)
+async def get_violation(violation_id: str, request: Request, response: Response, fields: Optional[str] = None):
+    v, etag = await conditional_get(violations_repo, violation_id, fields, request)
+    if v is None:
+        return not_modified(etag)
+    return with_etag(present_one(Violation, v, fields), response, etag)
 
 @router.put("/violations/{violation_id}", response_model=Violation, dependencies=[Depends(get_current_user)])
 async def update_violation(violation_id: str, violation: ViolationCreate):
-    db = get_database()
-    update_data = violation.dict()
-    if "is_deleted" in update_data:
-        del update_data["is_deleted"]
-    result = await db["violations"].update_one({"_id": violation_id, "is_deleted": False}, {"$set": update_data})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Violation not found")
-    v = await db["violations"].find_one({"_id": violation_id})
-    v["_id"] = str(v["_id"])
-    return Violation(**v)
+    data = violation.dict()
+    await blob_store.externalize_field(data, "evidence")
+    before, v = await violations_repo.update_with_previous(violation_id, data)
+    await rollups.record_change(before, v)
+    broker.publish_local("violation", "updated", v)
+    return present_one(Violation, v)
+
+@router.patch("/violations/{violation_id}", response_model=Violation, dependencies=[Depends(get_current_user)])
+async def patch_violation(violation_id: str, violation: ViolationUpdate):
+    data = violation.dict(exclude_unset=True)
+    await blob_store.externalize_field(data, "evidence")
+    before, v = await violations_repo.update_with_previous(violation_id, data)
+    await rollups.record_change(before, v)
+    broker.publish_local("violation", "updated", v)
+    return present_one(Violation, v)
 
 @router.delete("/violations/{violation_id}", dependencies=[Depends(get_current_admin_user)])
 async def delete_violation(violation_id: str):
-    db = get_database()
-    result = await db["violations"].update_one({"_id": violation_id, "is_deleted": False}, {"$set": {"is_deleted": True}})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Violation not found")
-    return {"detail": "Violation soft deleted"} 
\ No newline at end of file
+    v = await violations_repo.delete(violation_id)
+    await rollups.record([v], -1)
+    broker.publish_local("violation", "deleted", v)
+    return {"detail": "Violation soft deleted"}
\ No newline at end of file
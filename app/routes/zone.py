@@ -1,82 +1,105 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from app.models.zone import Zone, ZoneCreate
-from app.db import get_database
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from app.models.zone import Zone, ZoneCreate, ZoneUpdate, LocateRequest
+from app.geo import zone_index
+from app.repository import zones_repo
+from app.serialization import batch, page, present_one, present_many
+from app.dataloader import parse_ids
+from app.etags import conditional_get, etag_matches, list_etag, not_modified, with_etag
 from datetime import datetime
 from typing import List, Optional
 from app.auth import get_current_user, get_current_admin_user
 
 router = APIRouter()
 
+def index_zone(z):
+    try:
+        zone_index.set(z["_id"], z["name"], z["boundaries"])
+    except (ValueError, KeyError, TypeError):
+        # Legacy zones without GeoJSON boundaries cannot be located.
+        zone_index.remove(z["_id"])
+
 @router.post("/zones", response_model=Zone, dependencies=[Depends(get_current_user)])
 async def create_zone(zone: ZoneCreate):
-    db = get_database()
     zone_dict = zone.dict()
     zone_dict["created_at"] = datetime.utcnow()
-    result = await db["zones"].insert_one(zone_dict)
-    zone_dict["_id"] = str(result.inserted_id)
-    return Zone(**zone_dict)
+    zone_dict = await zones_repo.insert_one(zone_dict)
+    index_zone(zone_dict)
+    return present_one(Zone, zone_dict)
 
 @router.post("/zones/bulk", response_model=List[Zone], dependencies=[Depends(get_current_admin_user)])
 async def create_zones_bulk(zones: List[ZoneCreate]):
-    db = get_database()
     zone_dicts = [z.dict() for z in zones]
     for z in zone_dicts:
         z["created_at"] = datetime.utcnow()
-    result = await db["zones"].insert_many(zone_dicts)
-    inserted = []
-    for _id, z in zip(result.inserted_ids, zone_dicts):
-        z["_id"] = str(_id)
-        inserted.append(Zone(**z))
-    return inserted
+    zone_dicts = await zones_repo.insert_many(zone_dicts)
+    for z in zone_dicts:
+        index_zone(z)
+    return present_many(Zone, zone_dicts)
 
 @router.get("/zones", dependencies=[Depends(get_current_user)])
 async def list_zones(
+    request: Request,
+    response: Response,
     name: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     sort_by: str = "created_at",
-    order: int = -1
+    order: int = -1,
+    fields: Optional[str] = None,
+    include_total: bool = True
 ):
-    db = get_database()
+    etag = list_etag(zones_repo, request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     query = {"is_deleted": False}
     if name:
         query["name"] = name
-    total = await db["zones"].count_documents(query)
-    zones = []
-    cursor = db["zones"].find(query).sort(sort_by, order).skip(skip).limit(limit)
-    async for z in cursor:
-        z["_id"] = str(z["_id"])
-        zones.append(Zone(**z))
-    return {"items": zones, "total": total}
+    total, docs, next_cursor = await zones_repo.list(query, sort_by, order, skip, limit, cursor, fields, include_total)
+    return with_etag(page(Zone, docs, total, next_cursor, fields), response, etag)
+
+def _located(lat: float, lon: float):
+    zones = [{"zone_id": shape.zone_id, "name": shape.name} for shape in zone_index.locate(lon, lat)]
+    return {"lat": lat, "lon": lon, "zones": zones}
+
+def require_zone_index():
+    if not zone_index.ready:
+        raise HTTPException(status_code=503, detail="Zone index is not loaded yet")
+
+@router.get("/zones/locate", dependencies=[Depends(get_current_user), Depends(require_zone_index)])
+async def locate_zone(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180)):
+    return _located(lat, lon)
+
+@router.post("/zones/locate", dependencies=[Depends(get_current_user), Depends(require_zone_index)])
+async def locate_zones(request: LocateRequest):
+    return {"results": [_located(p.lat, p.lon) for p in request.points]}
+
+@router.get("/zones/batch", dependencies=[Depends(get_current_user)])
+async def get_zones_batch(ids: str, fields: Optional[str] = None):
+    ids = parse_ids(ids)
+    return batch(Zone, ids, await zones_repo.get_many(ids, fields), fields)
 
 @router.get("/zones/{zone_id}", response_model=Zone, dependencies=[Depends(get_current_user)])
-async def get_zone(zone_id: str):
-    db = get_database()
-    z = await db["zones"].find_one({"_id": zone_id, "is_deleted": False})
-    if not z:
-        raise HTTPException(status_code=404, detail="Zone not found")
-    z["_id"] = str(z["_id"])
-    return Zone(**z)
+async def get_zone(zone_id: str, request: Request, response: Response, fields: Optional[str] = None):
+    z, etag = await conditional_get(zones_repo, zone_id, fields, request)
+    if z is None:
+        return not_modified(etag)
+    return with_etag(present_one(Zone, z, fields), response, etag)
 
 @router.put("/zones/{zone_id}", response_model=Zone, dependencies=[Depends(get_current_user)])
 async def update_zone(zone_id: str, zone: ZoneCreate):
-    db = get_database()
-    update_data = zone.dict()
-    if "is_deleted" in update_data:
-        del update_data["is_deleted"]
-    result = await db["zones"].update_one({"_id": zone_id, "is_deleted": False}, {"$set": update_data})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Zone not found")
-    z = await db["zones"].find_one({"_id": zone_id})
-    z["_id"] = str(z["_id"])
-    return Zone(**z)
+    z = await zones_repo.update(zone_id, zone.dict())
+    index_zone(z)
+    return present_one(Zone, z)
+
+@router.patch("/zones/{zone_id}", response_model=Zone, dependencies=[Depends(get_current_user)])
+async def patch_zone(zone_id: str, zone: ZoneUpdate):
+    z = await zones_repo.update(zone_id, zone.dict(exclude_unset=True))
+    index_zone(z)
+    return present_one(Zone, z)
 
 @router.delete("/zones/{zone_id}", dependencies=[Depends(get_current_admin_user)])
 async def delete_zone(zone_id: str):
-    db = get_database()
-    result = await db["zones"].update_one(
-        {"_id": zone_id, "is_deleted": False}, {"$set": {"is_deleted": True}}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Zone not found")
-    return {"detail": "Zone soft deleted"} 
\ No newline at end of file
+    await zones_repo.delete(zone_id)
+    zone_index.remove(zone_id)
+    return {"detail": "Zone soft deleted"}
\ No newline at end of file
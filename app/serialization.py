@@ -0,0 +1,67 @@
+import json
+import os
+from datetime import date, datetime
+from typing import Optional
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# When enabled, reads and write responses skip Pydantic re-validation and
+# serialize the stored documents directly. Inputs are still validated.
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that encodes BSON documents directly (ObjectId and datetime included)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def present_one(model, doc: dict, fields: Optional[str] = None):
+    # Returning a Response bypasses the route's response_model, which a projected
+    # document could not satisfy anyway.
+    if fields or FAST_JSON_RESPONSES:
+        return FastJSONResponse(doc)
+    return model(**doc)
+
+
+def present_many(model, docs: list):
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(docs)
+    return [model(**doc) for doc in docs]
+
+
+def page(model, docs: list, total: int, next_cursor: Optional[str], fields: Optional[str] = None,
+         raw: bool = False):
+    # `raw` keeps keys the model does not declare, such as expanded references.
+    if raw or fields or FAST_JSON_RESPONSES:
+        return FastJSONResponse({"items": docs, "total": total, "next_cursor": next_cursor})
+    return {"items": [model(**doc) for doc in docs], "total": total, "next_cursor": next_cursor}
+
+
+def batch(model, ids: list, found: dict, fields: Optional[str] = None):
+    """Documents in the requested order, plus the ids that do not exist."""
+    docs = [found[i] for i in ids if i in found]
+    missing = [i for i in ids if i not in found]
+    if fields or FAST_JSON_RESPONSES:
+        return FastJSONResponse({"items": docs, "missing": missing})
+    return {"items": [model(**doc) for doc in docs], "missing": missing}
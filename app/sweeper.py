@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app import rollups
+from app.events import broker
+from app.repository import BUMP_VERSION, DUPLICATE_KEY, VERSION_FIELD, parking_spaces_repo, violations_repo, zones_repo
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = float(os.getenv("OVERSTAY_SWEEP_SECONDS", "60"))
+SWEEPER_ENABLED = os.getenv("OVERSTAY_SWEEPER_ENABLED", "true").lower() == "true"
+BATCH_SIZE = int(os.getenv("OVERSTAY_SWEEP_BATCH_SIZE", "1000"))
+
+
+class OverstayRule:
+    """A compiled zone rule, e.g.
+
+        {"type": "max_duration", "max_duration_minutes": 120,
+         "space_types": ["standard"], "days": [0, 1, 2, 3, 4], "hours": [8, 18],
+         "violation_type": "overstay"}
+
+    `days` are weekdays (Monday is 0) and `hours` a [start, end) range in UTC.
+    """
+
+    __slots__ = ("index", "max_seconds", "space_types", "days", "hours", "violation_type")
+
+    def __init__(self, index: int, rule: dict):
+        self.index = index
+        self.max_seconds = int(float(rule["max_duration_minutes"]) * 60)
+        self.space_types = frozenset(rule["space_types"]) if rule.get("space_types") else None
+        self.days = frozenset(rule["days"]) if rule.get("days") else None
+        self.hours = tuple(rule["hours"]) if rule.get("hours") else None
+        self.violation_type = rule.get("violation_type", "overstay")
+
+    def active_at(self, now: datetime) -> bool:
+        if self.days is not None and now.weekday() not in self.days:
+            return False
+        if self.hours is not None and not self.hours[0] <= now.hour < self.hours[1]:
+            return False
+        return True
+
+    def violated_by(self, space_type: str, duration: int) -> bool:
+        if self.space_types is not None and space_type not in self.space_types:
+            return False
+        return duration > self.max_seconds
+
+
+def compile_rules(rules) -> list:
+    compiled = []
+    for index, rule in enumerate(rules or []):
+        if not isinstance(rule, dict) or rule.get("type", "max_duration") != "max_duration":
+            continue
+        if "max_duration_minutes" not in rule:
+            continue
+        try:
+            compiled.append(OverstayRule(index, rule))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring invalid zone rule {rule}: {e}")
+    return compiled
+
+
+def dedupe_key(space_id: str, occupied_since: datetime, rule: OverstayRule) -> str:
+    # One violation per parking session and rule, whichever replica or run detects it.
+    return f"overstay:{space_id}:{occupied_since.isoformat()}:{rule.index}"
+
+
+class OverstaySweeper:
+    def __init__(self, interval: float = SWEEP_INTERVAL):
+        self.interval = interval
+        self.runs = 0
+        self.last_run = None
+        self.last_stats = {}
+        self._task = None
+
+    async def _zone_rules(self, now: datetime) -> dict:
+        rules = {}
+        async for z in zones_repo.collection.find({"is_deleted": False, "rules.0": {"$exists": True}}, {"rules": 1}):
+            active = [rule for rule in compile_rules(z.get("rules")) if rule.active_at(now)]
+            if active:
+                rules[str(z["_id"])] = active
+        return rules
+
+    async def _insert_violations(self, candidates: list) -> list:
+        ops = [
+            UpdateOne({"dedupe_key": doc["dedupe_key"]}, {"$setOnInsert": doc}, upsert=True)
+            for doc in candidates
+        ]
+        try:
+            result = await violations_repo.bulk_write(ops)
+            upserted = result.upserted_ids if result else {}
+        except BulkWriteError as e:
+            # Another replica created some of these first; those are duplicates, not errors.
+            if any(err["code"] != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                raise
+            upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+        created = []
+        for index, _id in upserted.items():
+            doc = dict(candidates[index], _id=str(_id))
+            created.append(doc)
+        return created
+
+    async def _flush(self, refreshes: list, candidates: list, stats: dict):
+        if refreshes:
+            await parking_spaces_repo.bulk_write(refreshes)
+            stats["refreshed"] += len(refreshes)
+        if not candidates:
+            return
+        created = await self._insert_violations(candidates)
+        stats["violations_created"] += len(created)
+        if not created:
+            return
+        await parking_spaces_repo.bulk_write([
+            UpdateOne(parking_spaces_repo.id_query(v["parking_space_id"]),
+                      {"$addToSet": {"associated_violation_ids": v["_id"]}, "$inc": BUMP_VERSION})
+            for v in created
+        ])
+        await rollups.record(created)
+        for v in created:
+            broker.publish_local("violation", "created", v)
+
+    async def sweep(self) -> dict:
+        now = datetime.utcnow()
+        zone_rules = await self._zone_rules(now)
+        stats = {"scanned": 0, "refreshed": 0, "violations_created": 0}
+        refreshes, candidates = [], []
+        cursor = parking_spaces_repo.collection.find(
+            {"is_deleted": False, "status": "occupied", "occupied_since": {"$lte": now}},
+            {"zone_id": 1, "type": 1, "occupied_by_car_id": 1, "occupied_since": 1},
+        ).sort("occupied_since", 1)
+        async for space in cursor:
+            stats["scanned"] += 1
+            duration = int((now - space["occupied_since"]).total_seconds())
+            refreshes.append(UpdateOne(
+                {"_id": space["_id"]},
+                {"$set": {"current_parking_duration_seconds": duration}, "$inc": BUMP_VERSION},
+            ))
+            space_id = str(space["_id"])
+            for rule in zone_rules.get(space.get("zone_id"), ()):
+                if rule.violated_by(space.get("type"), duration):
+                    candidates.append({
+                        "car_id": space.get("occupied_by_car_id") or "unknown",
+                        "parking_space_id": space_id,
+                        "zone_id": space.get("zone_id"),
+                        "type": rule.violation_type,
+                        "status": "open",
+                        "detected_at": now,
+                        "evidence": [],
+                        "verification_details": {
+                            "source": "overstay_sweeper",
+                            "rule_index": rule.index,
+                            "max_duration_seconds": rule.max_seconds,
+                            "duration_seconds": duration,
+                            "occupied_since": space["occupied_since"],
+                        },
+                        "is_deleted": False,
+                        "dedupe_key": dedupe_key(space_id, space["occupied_since"], rule),
+                        VERSION_FIELD: 1,
+                    })
+            if len(refreshes) >= BATCH_SIZE:
+                await self._flush(refreshes, candidates, stats)
+                refreshes, candidates = [], []
+        await self._flush(refreshes, candidates, stats)
+        self.runs += 1
+        self.last_run = now
+        stats["seconds"] = round((datetime.utcnow() - now).total_seconds(), 3)
+        self.last_stats = stats
+        return stats
+
+    async def _run(self):
+        while True:
+            try:
+                stats = await self.sweep()
+                if stats["violations_created"]:
+                    logger.info(f"Overstay sweep: {stats}")
+            except Exception as e:
+                logger.error(f"Overstay sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if SWEEPER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "enabled": SWEEPER_ENABLED,
+            "interval": self.interval,
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_sweep": self.last_stats,
+        }
+
+
+overstay_sweeper = OverstaySweeper()
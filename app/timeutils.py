@@ -0,0 +1,6 @@
+from datetime import datetime, timezone
+
+
+def naive_utc(at: datetime) -> datetime:
+    """MongoDB stores naive UTC; convert client timestamps with an offset to match."""
+    return at.astimezone(timezone.utc).replace(tzinfo=None) if at.tzinfo else at
@@ -0,0 +1,86 @@
+"""Measure /health latency while a burst of logins is in flight.
+
+Runs against a live server, e.g.:
+
+    python benchmarks/health_during_logins.py --url http://localhost:8080 \
+        --email bench@example.com --password secret --logins 200 --concurrency 50
+
+The account is registered on first use. Requires httpx.
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def login_storm(client, args, done):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    statuses = {}
+
+    async def one():
+        async with semaphore:
+            r = await client.post("/auth/login", json={"email": args.email, "password": args.password})
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(args.logins)))
+    done.set()
+    return statuses
+
+
+async def probe_health(client, done, interval):
+    samples = []
+    while not done.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        await client.post("/auth/register", json={"email": args.email, "password": args.password})
+        baseline = []
+        for _ in range(50):
+            start = time.perf_counter()
+            await client.get("/health")
+            baseline.append((time.perf_counter() - start) * 1000)
+        done = asyncio.Event()
+        start = time.perf_counter()
+        statuses, samples = await asyncio.gather(
+            login_storm(client, args, done), probe_health(client, done, args.probe_interval)
+        )
+        elapsed = time.perf_counter() - start
+    result = {
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "login_statuses": statuses,
+        "logins_per_second": round(args.logins / elapsed, 1),
+        "health_idle_ms": {"p50": percentile(baseline, 50), "p99": percentile(baseline, 99)},
+        "health_under_load_ms": {
+            "samples": len(samples),
+            "p50": percentile(samples, 50),
+            "p99": percentile(samples, 99),
+            "max": max(samples) if samples else None,
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,319 @@
+"""Seed a database and drive app.main:app with concurrent clients; report per-endpoint latency as JSON.
+
+By default the app runs in-process (httpx ASGI transport, startup hooks included)
+against MONGO_URI, in a dedicated database that is dropped and re-seeded:
+
+    python benchmarks/load_test.py --duration 30 --concurrency 32 --output bench/HEAD.json
+
+`--mongo memory` swaps MongoDB for mongomock-motor (no server needed; numbers
+only compare application overhead), and `--url` drives an already running
+server instead (seed it first and pass `--reuse-seed`). Compare two runs with
+`--compare bench/base.json`.
+
+Requires httpx (and mongomock-motor for `--mongo memory`).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCENARIOS = {
+    # name: weight
+    "login": 1,
+    "list_violations": 6,
+    "list_violations_by_zone": 4,
+    "get_violation": 6,
+    "list_parking_spaces_by_zone": 4,
+    "patch_parking_space": 4,
+    "get_vehicle": 4,
+    "list_vehicles": 2,
+    "occupancy": 3,
+    "bulk_violations": 1,
+}
+EMAIL = "loadtest@example.com"
+PASSWORD = "loadtest-password"
+STATUSES = ["free", "occupied"]
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def violation(i: int, zone_id: str, space_id: str, now: datetime, rng: random.Random) -> dict:
+    return {
+        "car_id": f"car-{i % 5000}", "parking_space_id": space_id, "zone_id": zone_id,
+        "type": rng.choice(["overstay", "no_permit", "double_parking"]),
+        "status": rng.choice(["open", "confirmed", "closed"]),
+        "detected_at": now - timedelta(minutes=i), "evidence": [],
+        "verification_details": {"method": "ocr", "confidence": round(rng.random(), 3)},
+        "verification_history": None, "enforcement_details": None, "blockchain_record": None,
+        "is_deleted": False,
+    }
+
+
+async def seed(db, args):
+    """Insert zones, spaces, vehicles, violations and an admin user; return the ids scenarios pick from."""
+    from app.passwords import pwd_context
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    for name in await db.list_collection_names():
+        await db[name].drop()
+    zones = [{
+        "name": f"zone-{z}", "description": None,
+        "boundaries": {"type": "Polygon", "coordinates": [[
+            [z * 0.01, 0], [z * 0.01 + 0.01, 0], [z * 0.01 + 0.01, 0.01], [z * 0.01, 0.01], [z * 0.01, 0],
+        ]]},
+        "rules": [], "created_at": now, "is_deleted": False,
+    } for z in range(args.zones)]
+    zone_ids = [str(i) for i in (await db["zones"].insert_many(zones)).inserted_ids]
+    spaces = [{
+        "zone_id": zone_ids[i % len(zone_ids)], "type": "standard", "status": rng.choice(STATUSES),
+        "occupied_by_car_id": None, "occupied_since": None, "current_parking_duration_seconds": None,
+        "associated_violation_ids": [], "is_deleted": False,
+    } for i in range(args.spaces)]
+    space_ids = [str(i) for i in (await db["parking_spaces"].insert_many(spaces)).inserted_ids]
+    vehicles = [{
+        "license_plate": f"PS{i:06d}", "make": rng.choice(["Toyota", "Ford", "VW"]), "model": None,
+        "color": rng.choice(["grey", "black", "white"]),
+        "first_detected_at": now - timedelta(hours=2, minutes=i), "last_detected_at": now - timedelta(minutes=i),
+        "parking_duration_seconds": 7200, "snapshots": [], "tracking": None, "is_deleted": False,
+    } for i in range(args.vehicles)]
+    vehicle_ids = []
+    for offset in range(0, len(vehicles), 5000):
+        result = await db["vehicles"].insert_many(vehicles[offset:offset + 5000])
+        vehicle_ids.extend(str(i) for i in result.inserted_ids)
+    violation_ids = []
+    for offset in range(0, args.violations, 5000):
+        batch = [
+            violation(i, zone_ids[i % len(zone_ids)], space_ids[i % len(space_ids)], now, rng)
+            for i in range(offset, min(offset + 5000, args.violations))
+        ]
+        result = await db["violations"].insert_many(batch)
+        violation_ids.extend(str(i) for i in result.inserted_ids)
+    await db["users"].insert_one({
+        "email": EMAIL, "hashed_password": pwd_context.hash(PASSWORD), "roles": ["admin"],
+        "is_active": True, "mfa_enabled": False, "created_at": now, "updated_at": None,
+    })
+    return {"zones": zone_ids, "spaces": space_ids, "vehicles": vehicle_ids, "violations": violation_ids}
+
+
+async def load_ids(db) -> dict:
+    """Collect ids from a database seeded by an earlier run."""
+    ids = {}
+    for key, collection in (("zones", "zones"), ("spaces", "parking_spaces"), ("vehicles", "vehicles"), ("violations", "violations")):
+        docs = await db[collection].find({"is_deleted": False}, {"_id": 1}).to_list(length=None)
+        ids[key] = [str(d["_id"]) for d in docs]
+    if not all(ids.values()):
+        raise SystemExit("Database has no seeded data; run once without --reuse-seed first")
+    return ids
+
+
+def request_for(name: str, ids: dict, rng: random.Random):
+    """Return (method, path, json body) for one request of scenario `name`."""
+    if name == "login":
+        return "POST", "/auth/login", {"email": EMAIL, "password": PASSWORD}
+    if name == "list_violations":
+        return "GET", "/violations?limit=50", None
+    if name == "list_violations_by_zone":
+        return "GET", f"/violations?limit=50&zone_id={rng.choice(ids['zones'])}", None
+    if name == "get_violation":
+        return "GET", f"/violations/{rng.choice(ids['violations'])}", None
+    if name == "list_parking_spaces_by_zone":
+        return "GET", f"/parking-spaces?limit=50&zone_id={rng.choice(ids['zones'])}", None
+    if name == "patch_parking_space":
+        return "PATCH", f"/parking-spaces/{rng.choice(ids['spaces'])}", {"status": rng.choice(STATUSES)}
+    if name == "get_vehicle":
+        return "GET", f"/vehicles/{rng.choice(ids['vehicles'])}", None
+    if name == "list_vehicles":
+        return "GET", "/vehicles?limit=50", None
+    if name == "occupancy":
+        return "GET", "/occupancy", None
+    if name == "bulk_violations":
+        now = datetime.utcnow()
+        body = [
+            violation(i, rng.choice(ids["zones"]), rng.choice(ids["spaces"]), now, rng)
+            for i in range(100)
+        ]
+        for v in body:
+            v["detected_at"] = v["detected_at"].isoformat()
+        return "POST", "/violations/bulk", body
+    raise ValueError(name)
+
+
+async def worker(client, headers, ids, names, weights, deadline, results, rng):
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, body = request_for(name, ids, rng)
+        start = time.perf_counter()
+        try:
+            r = await client.request(method, path, json=body, headers=headers)
+            status = r.status_code
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = (time.perf_counter() - start) * 1000
+        entry = results.setdefault(name, {"latencies": [], "statuses": {}})
+        entry["latencies"].append(elapsed)
+        entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+
+
+def summarize(results: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for name in sorted(results):
+        latencies = results[name]["latencies"]
+        statuses = results[name]["statuses"]
+        errors = sum(n for s, n in statuses.items() if not s.isdigit() or int(s) >= 400)
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "statuses": statuses,
+            "rps": round(len(latencies) / elapsed, 1),
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies), 2),
+        }
+    every = [lat for r in results.values() for lat in r["latencies"]]
+    total = {
+        "requests": len(every),
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "rps": round(len(every) / elapsed, 1),
+        "p50_ms": round(percentile(every, 50), 2) if every else None,
+        "p95_ms": round(percentile(every, 95), 2) if every else None,
+        "p99_ms": round(percentile(every, 99), 2) if every else None,
+    }
+    return {"endpoints": endpoints, "total": total}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict):
+    print(f"{'endpoint':32} {'rps':>16} {'p50 ms':>18} {'p99 ms':>18}")
+    for name, now in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p99_ms"):
+            change = (now[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            cells.append(f"{now[key]:>9} ({change:+5.1f}%)")
+        print(f"{name:32} " + " ".join(cells))
+
+
+async def measure(args, client, ids: dict) -> dict:
+    r = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+    r.raise_for_status()
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    names = [n for n in SCENARIOS if not args.scenarios or n in args.scenarios]
+    weights = [SCENARIOS[n] for n in names]
+    # Warm caches and connections before measuring.
+    deadline = time.perf_counter() + args.warmup
+    await asyncio.gather(*(
+        worker(client, headers, ids, names, weights, deadline, {}, random.Random(-i))
+        for i in range(args.concurrency)
+    ))
+    results = {}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        worker(client, headers, ids, names, weights, deadline, results, random.Random(args.seed + i))
+        for i in range(args.concurrency)
+    ))
+    return summarize(results, time.perf_counter() - start)
+
+
+async def main(args):
+    import httpx
+
+    if args.mongo == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        db_client = AsyncMongoMockClient()
+    else:
+        import motor.motor_asyncio
+        db_client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    db = db_client[args.db]
+    ids = await load_ids(db) if args.reuse_seed else await seed(db, args)
+
+    if args.url:
+        # The server must use the same MONGO_URI and MONGO_DB=<--db>. Seed first (e.g. an
+        # in-process run), start the server, then pass --reuse-seed so its in-memory
+        # state is warmed from the data being queried.
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            report = await measure(args, client, ids)
+    else:
+        import app.db
+        import app.main
+
+        if args.mongo == "memory":
+            async def connect_in_memory():
+                app.db.client = db_client
+                app.db.db = db
+            app.main.connect_to_mongo = connect_in_memory
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with app.main.app.router.lifespan_context(app.main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                report = await measure(args, client, ids)
+
+    report["meta"] = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "target": args.url or "in-process",
+        "label": args.label,
+        "mongo": args.mongo,
+        "duration_seconds": args.duration,
+        "concurrency": args.concurrency,
+        "seed": {k: getattr(args, k) for k in ("zones", "spaces", "vehicles", "violations", "seed")},
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--mongo", choices=["server", "memory"], default="server")
+    parser.add_argument("--db", default="parksense_bench", help="database to drop and seed")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenarios", nargs="*", choices=list(SCENARIOS))
+    parser.add_argument("--zones", type=int, default=50)
+    parser.add_argument("--spaces", type=int, default=5000)
+    parser.add_argument("--vehicles", type=int, default=20000)
+    parser.add_argument("--violations", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reuse-seed", action="store_true", help="query the existing data instead of re-seeding")
+    parser.add_argument("--label", help="free-form note stored in the report, e.g. the server's worker count")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+    # app.db reads MONGO_DB at import time.
+    os.environ["MONGO_DB"] = args.db
+    # Every simulated client shares one IP and token; measure the app, not the rate limiter.
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    asyncio.run(main(args))
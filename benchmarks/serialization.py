@@ -0,0 +1,121 @@
+"""Compare the default (Pydantic) response path with the fast BSON-to-JSON path.
+
+For each model this times serializing one list page and one single-item
+response the way FastAPI does today (model construction, response_model
+validation, jsonable_encoder, json.dumps) against app.serialization.dumps on
+the raw documents.
+
+    python benchmarks/serialization.py --page-size 100 --repeat 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.camera import Camera  # noqa: E402
+from app.models.parking_space import ParkingSpace  # noqa: E402
+from app.models.vehicle import Vehicle  # noqa: E402
+from app.models.violation import Violation  # noqa: E402
+from app.models.zone import Zone  # noqa: E402
+from app.serialization import dumps  # noqa: E402
+
+NOW = datetime(2026, 1, 1, 8, 30)
+
+
+def sample(model, i: int) -> dict:
+    _id = str(ObjectId())
+    if model is Violation:
+        return {
+            "_id": _id, "car_id": f"car-{i}", "parking_space_id": f"ps-{i}", "zone_id": "zone-1",
+            "type": "overstay", "status": "open", "detected_at": NOW - timedelta(minutes=i),
+            "evidence": [f"blob-{i}-{n}" for n in range(3)],
+            "verification_details": {"method": "ocr", "confidence": 0.93, "operator": "auto"},
+            "verification_history": [{"at": NOW, "by": "auto", "result": "confirmed"} for _ in range(5)],
+            "enforcement_details": {"fine": 50, "currency": "EUR"}, "blockchain_record": None, "is_deleted": False,
+        }
+    if model is Vehicle:
+        return {
+            "_id": _id, "license_plate": f"AB{i:04d}", "make": "Toyota", "model": "Corolla", "color": "grey",
+            "first_detected_at": NOW - timedelta(hours=2), "last_detected_at": NOW, "parking_duration_seconds": 7200,
+            "snapshots": [f"blob-{i}-{n}" for n in range(10)], "tracking": {"camera_id": "cam-1", "bbox": [1, 2, 3, 4]},
+            "is_deleted": False,
+        }
+    if model is ParkingSpace:
+        return {
+            "_id": _id, "zone_id": "zone-1", "type": "standard", "status": "occupied", "occupied_by_car_id": f"car-{i}",
+            "occupied_since": NOW, "current_parking_duration_seconds": 600, "associated_violation_ids": [], "is_deleted": False,
+        }
+    if model is Camera:
+        return {
+            "_id": _id, "zone_id": "zone-1", "name": f"cam-{i}", "configuration": {"fps": 10, "resolution": "1080p"},
+            "health": {"temperature": 41.5, "uptime": 86400}, "status": "online", "is_deleted": False, "created_at": NOW,
+        }
+    return {
+        "_id": _id, "name": f"zone-{i}", "boundaries": {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [0, 0]]]},
+        "rules": [{"max_duration_minutes": 120}], "is_deleted": False, "created_at": NOW,
+    }
+
+
+def render(content) -> bytes:
+    return JSONResponse(content).body
+
+
+async def old_page(model, docs, total):
+    items = [model(**doc) for doc in docs]
+    content = await serialize_response(response_content={"items": items, "total": total, "next_cursor": None})
+    return render(content)
+
+
+async def old_item(model, field, doc):
+    content = await serialize_response(field=field, response_content=model(**doc))
+    return render(content)
+
+
+async def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def main(args):
+    results = {}
+    for model in (Violation, Vehicle, ParkingSpace, Camera, Zone):
+        docs = [sample(model, i) for i in range(args.page_size)]
+        field = create_model_field(name="Response_" + model.__name__, type_=model, mode="serialization")
+
+        async def new_page():
+            return dumps({"items": docs, "total": len(docs), "next_cursor": None})
+
+        async def new_item():
+            return dumps(docs[0])
+
+        old_page_us = await timed(lambda: old_page(model, docs, len(docs)), args.repeat)
+        new_page_us = await timed(new_page, args.repeat)
+        old_item_us = await timed(lambda: old_item(model, field, docs[0]), args.repeat * 10)
+        new_item_us = await timed(new_item, args.repeat * 10)
+        results[model.__name__] = {
+            "page_old_us": round(old_page_us, 1),
+            "page_fast_us": round(new_page_us, 1),
+            "page_speedup": round(old_page_us / new_page_us, 1),
+            "item_old_us": round(old_item_us, 1),
+            "item_fast_us": round(new_item_us, 1),
+            "item_speedup": round(old_item_us / new_item_us, 1),
+        }
+    print(json.dumps({"page_size": args.page_size, "repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -9,8 +9,44 @@ if [ ! -f .env ]; then
   echo "WARNING: .env file not found in project root. Please create one for backend configuration."
 fi
 
+# Serving profile (override via environment):
+#   WEB_CONCURRENCY         worker processes (default 1; "auto" = one per CPU)
+#   UVICORN_LOOP            event loop: uvloop | asyncio | auto (default auto, uvloop when installed)
+#   UVICORN_HTTP            HTTP parser: httptools | h11 | auto (default auto, httptools when installed)
+#   GRACEFUL_TIMEOUT        seconds to drain in-flight requests after SIGTERM (default 25,
+#                           inside Cloud Run's 30s termination window)
+#   KEEP_ALIVE_TIMEOUT      idle keep-alive seconds (default 5)
+#   MAX_REQUESTS            recycle a worker after this many requests (default 0 = never)
+#   ACCESS_LOG              set to false to skip per-request access logging
+#   FORWARDED_ALLOW_IPS     proxies whose X-Forwarded-For is trusted for the client IP
+#                           (default *: Cloud Run's front end is the only way in; narrow
+#                           it when the port is reachable directly)
+WORKERS=${WEB_CONCURRENCY:-1}
+if [ "$WORKERS" = "auto" ]; then
+  WORKERS=$(nproc)
+fi
+
+ARGS=(
+  --host 0.0.0.0
+  --port "${PORT:-8080}"
+  --workers "$WORKERS"
+  --loop "${UVICORN_LOOP:-auto}"
+  --http "${UVICORN_HTTP:-auto}"
+  --timeout-graceful-shutdown "${GRACEFUL_TIMEOUT:-25}"
+  --timeout-keep-alive "${KEEP_ALIVE_TIMEOUT:-5}"
+  --proxy-headers
+  --forwarded-allow-ips "${FORWARDED_ALLOW_IPS:-*}"
+)
+if [ "${ACCESS_LOG:-true}" = "false" ]; then
+  ARGS+=(--no-access-log)
+fi
+if [ "${MAX_REQUESTS:-0}" -gt 0 ]; then
+  ARGS+=(--limit-max-requests "$MAX_REQUESTS")
+fi
+
 # # Start FastAPI backend
 # echo "Starting FastAPI backend (http://localhost:8000)..."
 # uvicorn app.main:app --host 0.0.0.0 --port 8000
-echo "Starting FastAPI backend (http://localhost:8080)..."
-uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8080}
+echo "Starting FastAPI backend (http://localhost:${PORT:-8080}, $WORKERS worker(s))..."
+# exec so SIGTERM reaches uvicorn directly and in-flight requests are drained.
+exec uvicorn app.main:app "${ARGS[@]}"
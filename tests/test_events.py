@@ -0,0 +1,12 @@
+from app.events import Broker
+
+
+def test_published_events_leave_out_hidden_fields():
+    broker = Broker()
+    subscription = broker.subscribe({"violation"})
+    doc = {"_id": "v1", "zone_id": "z", "status": "open", "dedupe_key": "overstay:s:t:0"}
+    broker.publish("violation", "created", doc)
+    (event,) = subscription.pending.values()
+    assert event["data"] == {"_id": "v1", "zone_id": "z", "status": "open"}
+    # The caller's document is not modified.
+    assert doc["dedupe_key"] == "overstay:s:t:0"
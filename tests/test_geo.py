@@ -0,0 +1,31 @@
+import pytest
+from app.geo import validate_geojson
+
+
+def polygon(*rings):
+    return {"type": "Polygon", "coordinates": [list(map(list, ring)) for ring in rings]}
+
+
+@pytest.mark.parametrize("ring", [
+    [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)],
+    [(0, 0), (2, 0), (2, 2), (1, 1), (0, 2), (0, 0)],
+    # Repeated consecutive positions are tolerated.
+    [(0, 0), (1, 0), (1, 0), (1, 1), (0, 0)],
+])
+def test_simple_rings_are_accepted(ring):
+    validate_geojson(polygon(ring))
+
+
+@pytest.mark.parametrize("ring", [
+    # Bow-tie: the edges (0,0)-(1,1) and (1,0)-(0,1) cross.
+    [(0, 0), (1, 1), (1, 0), (0, 1), (0, 0)],
+    # Non-adjacent edges meet at a repeated vertex.
+    [(0, 0), (2, 0), (1, 1), (2, 2), (0, 2), (1, 1), (0, 0)],
+    # Spike folding back along the previous edge.
+    [(0, 0), (2, 0), (1, 0), (1, 1), (0, 0)],
+    # Collapsed ring.
+    [(0, 0), (1, 0), (0, 0), (0, 0)],
+])
+def test_self_intersecting_rings_are_rejected(ring):
+    with pytest.raises(ValueError, match="intersect"):
+        validate_geojson(polygon(ring))
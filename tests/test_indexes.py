@@ -0,0 +1,28 @@
+import pytest
+from fastapi import HTTPException
+from app.indexes import ensure_query_indexed
+
+
+@pytest.mark.parametrize("collection, query, sort_by", [
+    ("vehicles", {"is_deleted": False, "color": "red"}, "first_detected_at"),
+    ("vehicles", {"is_deleted": False, "make": "A", "model": "B"}, "first_detected_at"),
+    ("parking_spaces", {"is_deleted": False, "zone_id": "z"}, "zone_id"),
+    ("parking_spaces", {"is_deleted": False, "status": "occupied"}, "occupied_since"),
+    ("violations", {"is_deleted": False, "zone_id": "z", "status": "open"}, "detected_at"),
+    ("users", {"email": "a@b.c"}, "created_at"),
+])
+def test_indexed_queries_are_accepted(collection, query, sort_by):
+    ensure_query_indexed(collection, query, sort_by)
+
+
+@pytest.mark.parametrize("collection, query, sort_by", [
+    # A filter outside the index prefix would be applied document by document.
+    ("vehicles", {"is_deleted": False, "make": "A", "color": "red"}, "first_detected_at"),
+    ("violations", {"is_deleted": False, "zone_id": "z", "type": "t"}, "detected_at"),
+    # Sorting past an unpinned key needs an in-memory sort.
+    ("parking_spaces", {"is_deleted": False, "status": "occupied"}, "_id"),
+])
+def test_unindexed_queries_are_rejected(collection, query, sort_by):
+    with pytest.raises(HTTPException) as e:
+        ensure_query_indexed(collection, query, sort_by)
+    assert e.value.status_code == 400
@@ -0,0 +1,33 @@
+import pytest
+from app.pagination import keyset_query, sort_spec
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def walk(collection, query, sort_by, order, limit):
+    seen, last = [], None
+    while True:
+        find = query if last is None else keyset_query(query, sort_by, order, last.get(sort_by), last["_id"])
+        page = list(collection.find(find).sort(sort_spec(sort_by, order)).limit(limit))
+        seen += [doc["_id"] for doc in page]
+        if len(page) < limit:
+            return seen
+        last = page[-1]
+
+
+@pytest.mark.parametrize("order", [1, -1])
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_keyset_pages_cover_null_and_missing_keys(order, limit):
+    collection = mongomock.MongoClient().db.spaces
+    collection.insert_many([
+        {"_id": 1, "status": "occupied", "occupied_since": 10},
+        {"_id": 2, "status": "occupied", "occupied_since": None},
+        {"_id": 3, "status": "occupied", "occupied_since": 20},
+        {"_id": 4, "status": "occupied"},
+        {"_id": 5, "status": "occupied", "occupied_since": 20},
+        {"_id": 6, "status": "free", "occupied_since": 30},
+    ])
+    query = {"status": "occupied"}
+    expected = [doc["_id"] for doc in collection.find(query).sort(sort_spec("occupied_since", order))]
+    assert walk(collection, query, "occupied_since", order, limit) == expected
+    assert sorted(expected) == [1, 2, 3, 4, 5]